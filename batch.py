@@ -0,0 +1,72 @@
+import numpy as np
+
+import moves
+
+
+def route_costs(cost, routes):
+    """Cost of every route of an (M, L) array, rows [0, ..., 0]
+    """
+    routes = np.asarray(routes)
+    return np.asarray(cost[routes[:, :-1], routes[:, 1:]], dtype=float).sum(axis=1)
+
+
+def route_loads(routes, pickup, delivery):
+    """(M, L - 1) vehicle loads on the arcs of every route, see feasibility.LoadProfile
+    """
+    routes = np.asarray(routes)
+    nodes = routes[:, :-1]
+    start = delivery[nodes].sum(axis=1)
+    return start[:, None] + np.cumsum(pickup[nodes] - delivery[nodes], axis=1)
+
+
+def valid_routes(routes, vertices_num):
+    """Whether every route starts and ends at the depot and visits every customer exactly once
+    """
+    routes = np.asarray(routes)
+    if routes.shape[1] != vertices_num + 1:
+        return np.zeros(len(routes), dtype=bool)
+    customers = np.sort(routes[:, 1:-1], axis=1)
+    return (routes[:, 0] == 0) & (routes[:, -1] == 0) & (customers == np.arange(1, vertices_num)).all(axis=1)
+
+
+def evaluate_routes(cost, routes, pickup, delivery, capacity, chunk_size=4096):
+    """Cost and feasibility of many candidate routes at once
+    Parameters
+    ----------
+    cost : np.ndarray
+    (N, N) cost matrix, or any object indexed like it (e.g. data.benchmark.EuclideanCost)
+    routes : np.ndarray
+    (M, N + 1) integer array, one route [0, ..., 0] per row
+    chunk_size : int
+    rows evaluated together, bounding the (chunk_size, N) temporaries
+    Returns
+    ----------
+    (np.ndarray, np.ndarray)
+    the (M,) route costs and the (M,) feasibility of the routes, the same as
+    feasibility.check_route gives route by route
+    """
+    routes = np.atleast_2d(np.asarray(routes, dtype=np.int64))
+    costs = np.empty(len(routes))
+    feasible = np.empty(len(routes), dtype=bool)
+    for start in range(0, len(routes), chunk_size):
+        chunk = routes[start:start + chunk_size]
+        valid = valid_routes(chunk, len(cost))
+        # invalid rows may hold out of range nodes, they are scored on the depot
+        safe = np.where(((chunk >= 0) & (chunk < len(cost))).all(axis=1)[:, None], chunk, 0)
+        costs[start:start + len(chunk)] = route_costs(cost, safe)
+        feasible[start:start + len(chunk)] = valid & (route_loads(safe, pickup, delivery).max(axis=1) <= capacity)
+    return costs, feasible
+
+
+def swap_routes(path, nodes_i, nodes_j):
+    """(M, L) array of the routes obtained by swapping each pair (nodes_i[m], nodes_j[m]) of path
+    """
+    path = np.asarray(path, dtype=np.int64)
+    position = moves.position_index(path)
+    a = position[np.asarray(nodes_i)]
+    b = position[np.asarray(nodes_j)]
+    routes = np.tile(path, (len(a), 1))
+    rows = np.arange(len(a))
+    routes[rows, a] = path[b]
+    routes[rows, b] = path[a]
+    return routes
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+
+import lp
+import data
+from ts import Tabu_Search
+from routes import Route_Tabu_Search
+from benchmark_suite import SUFFIXES
+
+
+# solver options an entry may set, see solve_entry
+SOLVER_OPTIONS = ("vehicles", "N_iter", "tabu_tenure", "penalty_value", "time_limit", "candidate_k", "operators")
+
+
+def read_manifest(path):
+    """Instance entries of a manifest, a directory or a JSON lines / JSON list file
+
+    A directory gives one entry per benchmark file (benchmark_suite.SUFFIXES)
+    and per instance saved with data.storage.save_instance, in name order. In
+    a manifest file every entry is a JSON object with an "instance" (path,
+    bundled name or "create_instance") and optionally a "name", a "seed",
+    instance "options" passed to data.get and any of SOLVER_OPTIONS.
+    Relative instance paths are resolved against the manifest directory.
+    """
+    if os.path.isdir(path):
+        entries = []
+        for filename in sorted(os.listdir(path)):
+            instance = os.path.join(path, filename)
+            if data.storage.is_instance(instance) or filename.lower().endswith(SUFFIXES):
+                entries.append({"instance": instance, "name": os.path.splitext(filename)[0]})
+        return entries
+    with open(path) as f:
+        if path.endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [json.loads(line) for line in f if line.strip() and not line.startswith("#")]
+    root = os.path.dirname(os.path.abspath(path))
+    for entry in entries:
+        candidate = os.path.join(root, entry["instance"])
+        if not os.path.isabs(entry["instance"]) and os.path.exists(candidate):
+            entry["instance"] = candidate
+    return entries
+
+
+def load_problem(entry):
+    """lp.LP of a manifest entry, without the symbolic graph and constraint strings
+    """
+    instance = data.get(entry["instance"], seed=entry.get("seed"), symbolic=False, **entry.get("options", {}))
+    if isinstance(instance, str):
+        raise ValueError(f"Unknown instance: {entry['instance']}")
+    G, COST, OBJ_FUNC, CONSTRAINTS, PICKUP, DELIVERY, CAPACITY = instance
+    return lp.LP(graph=G, cost=COST, objective_function=OBJ_FUNC, constraints=CONSTRAINTS, pickup=PICKUP, delivery=DELIVERY, capacity=CAPACITY)
+
+
+def solve_problem(problem, options):
+    """Solve a problem with the given solver options (SOLVER_OPTIONS)
+
+    A single route is searched with Tabu_Search unless vehicles is set,
+    in which case Route_Tabu_Search is used, without time limit.
+    Returns
+    ----------
+    dict
+    status "ok", best value, feasibility, path or routes, termination and iterations
+    """
+    options = dict(options)
+    vehicles = options.pop("vehicles", None)
+    if vehicles is None:
+        solver = Tabu_Search(problem, verbosity="quiet", **options)
+        solution = solver.solve()
+        return {
+            "status": "ok",
+            "best_value": float(solution["value"]),
+            "feasible": solution["feasible"],
+            "path": [int(node) for node in solution["path"]],
+            "termination": solution["termination"],
+            "iterations": int(solution["iterations"]),
+        }
+    options.pop("time_limit", None)
+    options.pop("operators", None)
+    solver = Route_Tabu_Search(problem, vehicles=vehicles, verbosity="quiet", **options)
+    solver.run()
+    return {
+        "status": "ok",
+        "best_value": float(solver.get_best_value()),
+        "feasible": bool(solver.best_solution.is_feasible()),
+        "routes": [[int(node) for node in route] for route in solver.get_best_solution()],
+        "termination": "stagnation",
+        "iterations": int(solver.iterations),
+    }
+
+
+def solve_entry(entry, defaults=None):
+    """Solve one manifest entry and return its result, errors included
+
+    Returns
+    ----------
+    dict
+    name, status ("ok" or "error"), runtime, best value, feasibility and
+    route(s), termination and iterations of the search, or the error and
+    its traceback
+    """
+    start_time = time.perf_counter()
+    options = {**(defaults or {}), **{key: entry[key] for key in SOLVER_OPTIONS if key in entry}}
+    result = {"name": entry.get("name", str(entry["instance"])), "instance": entry["instance"]}
+    try:
+        result.update(solve_problem(load_problem(entry), options))
+    except Exception as error:
+        result.update({"status": "error", "error": repr(error), "traceback": traceback.format_exc()})
+    result["runtime"] = time.perf_counter() - start_time
+    return result
+
+
+def _worker_main(conn, defaults):
+    """Loop of a worker process: solve the entries sent on conn until None or the pipe closes
+    """
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        index, entry = task
+        conn.send((index, solve_entry(entry, defaults)))
+
+
+class _Worker(object):
+    def __init__(self, context, defaults):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, defaults), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = None
+
+    def send(self, index, entry):
+        self.task = (index, entry)
+        self.started = time.perf_counter()
+        self.conn.send(self.task)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class BatchSolver(object):
+    """Warm pool of worker processes solving instance entries, results streamed as they finish
+
+    Workers are started once and keep numpy, networkx and the solver
+    modules imported between instances. Each entry is solved with its
+    own time_limit (or the default one) as the budget of the search. An
+    entry still running grace seconds after its time limit has its worker
+    killed and replaced (except entries with vehicles, solved without time
+    limit), as has the entry of a worker that dies, so one
+    bad instance costs one result with status "timeout" or "crashed"
+    instead of stalling the batch. Exceptions raised while loading or
+    solving are reported with status "error".
+    """
+    def __init__(self, workers=None, grace=5.0, **defaults):
+        self.workers = workers or os.cpu_count()
+        self.grace = grace
+        self.defaults = defaults
+        self.context = multiprocessing.get_context()
+        self.pool = []
+
+    def start(self):
+        while len(self.pool) < self.workers:
+            self.pool.append(_Worker(self.context, self.defaults))
+
+    def close(self):
+        for worker in self.pool:
+            worker.stop()
+        self.pool = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def deadline(self, worker):
+        """Time at which the entry of a busy worker is given up, None without time limit
+
+        Entries with vehicles have no deadline either, since
+        Route_Tabu_Search runs without time limit (see solve_problem).
+        """
+        entry = worker.task[1]
+        time_limit = entry.get("time_limit", self.defaults.get("time_limit"))
+        if time_limit is None or entry.get("vehicles", self.defaults.get("vehicles")) is not None:
+            return None
+        return worker.started + time_limit + self.grace
+
+    def _replace(self, worker, status):
+        """Kill a worker given up with status ("timeout" or "crashed") and start a new one in its place
+        """
+        index, entry = worker.task
+        worker.kill()
+        self.pool[self.pool.index(worker)] = _Worker(self.context, self.defaults)
+        result = {"name": entry.get("name", str(entry["instance"])), "instance": entry["instance"], "status": status, "runtime": time.perf_counter() - worker.started}
+        if status == "crashed":
+            result["exitcode"] = worker.process.exitcode
+        return index, result
+
+    def solve(self, entries):
+        """Solve the entries, yielding (index, result) in completion order
+        """
+        self.start()
+        pending = list(enumerate(entries))[::-1]
+        busy = 0
+        while pending or busy:
+            for worker in self.pool:
+                if worker.task is None and pending:
+                    worker.send(*pending.pop())
+                    busy += 1
+            running = [worker for worker in self.pool if worker.task is not None]
+            deadlines = [d for d in (self.deadline(worker) for worker in running) if d is not None]
+            timeout = max(min(deadlines) - time.perf_counter(), 0.0) if deadlines else None
+            ready = wait([worker.conn for worker in running], timeout=timeout)
+            for worker in running:
+                if worker.conn in ready:
+                    try:
+                        index, result = worker.conn.recv()
+                    except (EOFError, OSError):
+                        index, result = self._replace(worker, "crashed")
+                    else:
+                        worker.task = None
+                    busy -= 1
+                    yield index, result
+                else:
+                    deadline = self.deadline(worker)
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        busy -= 1
+                        yield self._replace(worker, "timeout")
+
+
+def solve_batch(source, output=None, workers=None, grace=5.0, **defaults):
+    """Solve every instance of a manifest or directory with a warm worker pool
+    Parameters
+    ----------
+    source : str
+    directory or manifest file, see read_manifest
+    output : str
+    JSON lines file every result is appended to as soon as it is known
+    workers : int
+    number of worker processes, defaults to the number of CPUs
+    grace : float
+    seconds after its time limit before an instance is given up
+    defaults
+    solver options (SOLVER_OPTIONS) of the entries that do not set them
+    Returns
+    ----------
+    list
+    results of every entry, in manifest order
+    """
+    entries = read_manifest(source)
+    results = [None] * len(entries)
+    with BatchSolver(workers=min(workers or os.cpu_count(), max(len(entries), 1)), grace=grace, **defaults) as solver:
+        for index, result in solver.solve(entries):
+            results[index] = result
+            if output is not None:
+                with open(output, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', type=str, help='Directory of instances, or JSON lines / JSON manifest of instance entries.')
+    parser.add_argument('--output', type=str, default=None, help='JSON lines file the results are appended to as they finish.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes, defaults to the number of CPUs.')
+    parser.add_argument('--time_limit', type=float, default=None, help='Default wall-clock budget in seconds of every instance.')
+    parser.add_argument('--grace', type=float, default=5.0, help='Seconds after its time limit before an instance is given up.')
+    parser.add_argument('--vehicles', type=int, default=None, help='Default number of vehicles, a single route if not given.')
+    parser.add_argument('--N_iter', type=int, default=10, help='Non-improving iterations before a search terminates.')
+    parser.add_argument('--candidate_k', type=int, default=None, help='Size of the nearest neighbor lists of the granular search.')
+    args = parser.parse_args()
+
+    results = solve_batch(args.source, output=args.output, workers=args.workers, grace=args.grace, time_limit=args.time_limit, vehicles=args.vehicles, N_iter=args.N_iter, candidate_k=args.candidate_k)
+
+    print(f"{'instance': <24} {'status': >8} {'runtime': >8} {'feasible': >8} {'best_value': >12}")
+    for result in results:
+        best_value = f"{result['best_value']:.2f}" if "best_value" in result else "-"
+        print(f"{result['name']: <24} {result['status']: >8} {result['runtime']: >8.3f} {str(result.get('feasible', '-')): >8} {best_value: >12}")
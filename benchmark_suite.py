@@ -0,0 +1,202 @@
+import os
+import json
+import math
+import time
+import traceback
+import argparse
+import numpy as np
+
+import lp
+import data
+import exact
+from ts import Tabu_Search
+from routes import Route_Tabu_Search
+
+
+SUFFIXES = (".txt", ".vrp", ".vrpspd", ".dat")
+# best-known value files of a benchmark directory, never read as instances
+BEST_KNOWN_FILES = ("best_known.txt", "best_known.json")
+
+
+def load_best_known(path):
+    """Best-known values by instance name, from a JSON object or from "name value" lines
+    """
+    if path is None:
+        return {}
+    with open(path) as f:
+        if path.endswith(".json"):
+            return {name: float(value) for name, value in json.load(f).items()}
+        best_known = {}
+        for line in f:
+            tokens = line.split()
+            if len(tokens) >= 2 and not tokens[0].startswith("#"):
+                best_known[tokens[0]] = float(tokens[1])
+        return best_known
+
+
+def find_best_known(directory):
+    """Best-known value file (BEST_KNOWN_FILES) of a benchmark directory, None if there is none
+    """
+    for filename in BEST_KNOWN_FILES:
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def get_instances(directory, exclude=()):
+    """Benchmark files of a directory, sorted by name, without its best-known value files
+    """
+    exclude = {os.path.abspath(path) for path in exclude if path is not None}
+    paths = [os.path.join(directory, filename) for filename in os.listdir(directory) if filename.lower().endswith(SUFFIXES) and filename.lower() not in BEST_KNOWN_FILES]
+    return sorted(path for path in paths if os.path.abspath(path) not in exclude)
+
+
+def get_vehicles(instance):
+    """Vehicles to solve a benchmark instance with: its VEHICLES if given, else the fewest whose capacity holds every delivery and every pickup
+    """
+    if instance.vehicles is not None:
+        return instance.vehicles
+    demand = max(float(sum(instance.DELIVERY)), float(sum(instance.PICKUP)))
+    return max(math.ceil(demand / instance.CAPACITY), 1)
+
+
+def solve_instance(path, best_known=None, vehicles=None, N_iter=10, tabu_tenure=5, penalty_value=5, time_limit=None, precision=None, candidate_k=None):
+    """Solve one benchmark file and return its stats
+    Parameters
+    ----------
+    path : str
+    benchmark file, see data.benchmark.load_benchmark
+    best_known : float
+    best-known value, defaults to the BEST_KNOWN of the file if any
+    vehicles : int
+    solve with up to this many vehicles using Route_Tabu_Search, a single route being solved with Tabu_Search;
+    None takes the number of vehicles of the instance, see get_vehicles
+    candidate_k : int
+    size of the nearest neighbor lists of the granular search, None uses the full neighborhood
+    Returns
+    ----------
+    dict
+    name, status "ok", size, vehicles, runtime, iterations, iterations and moves per second, phase times, counters, best value, feasibility and
+    gap to the best-known value (None for an infeasible solution)
+    """
+    instance = data.benchmark.load_benchmark(path, precision=precision)
+    problem = lp.LP(
+        graph=None,
+        cost=instance.COST,
+        objective_function=None,
+        constraints=None,
+        pickup=instance.PICKUP,
+        delivery=instance.DELIVERY,
+        capacity=instance.CAPACITY,
+    )
+    if best_known is None:
+        best_known = instance.best_known
+    if vehicles is None:
+        vehicles = get_vehicles(instance)
+
+    start_time = time.perf_counter()
+    # the per-iteration output of the solvers is not part of the results
+    if vehicles == 1:
+        solver = Tabu_Search(problem, N_iter=N_iter, tabu_tenure=tabu_tenure, penalty_value=penalty_value, time_limit=time_limit, candidate_k=candidate_k, verbosity="quiet")
+        solver.run()
+        feasible = bool(solver.check_constraints(solver.get_best_solution()))
+    else:
+        solver = Route_Tabu_Search(problem, vehicles=vehicles, N_iter=N_iter, tabu_tenure=tabu_tenure, penalty_value=penalty_value, candidate_k=candidate_k, verbosity="quiet")
+        solver.run()
+        feasible = bool(solver.best_solution.is_feasible())
+    runtime = time.perf_counter() - start_time
+
+    best_value = float(solver.get_best_value())
+    return {
+        "name": instance.name,
+        "file": path,
+        "status": "ok",
+        "customers": len(instance.COST) - 1,
+        "vehicles": vehicles,
+        "runtime": runtime,
+        "iterations": int(solver.iterations),
+        "iterations_per_second": solver.iterations / runtime if runtime > 0 else np.inf,
+        # phase timers and counters of the single route search, see telemetry.SearchStats
+        "moves_per_second": solver.stats.moves_per_second if vehicles == 1 else None,
+        "phases": solver.stats.phases if vehicles == 1 else None,
+        "counters": solver.stats.counters if vehicles == 1 else None,
+        "best_value": best_value,
+        "feasible": feasible,
+        "best_known": best_known,
+        "gap": None if best_known is None or not feasible else float(exact.optimality_gap(best_value, best_known)),
+    }
+
+
+def run_suite(directory, best_known=None, output=None, **kwargs):
+    """Solve every benchmark file of a directory, in name order
+    Parameters
+    ----------
+    directory : str
+    directory holding the benchmark files (SUFFIXES)
+    best_known : str
+    file of best-known values by instance name or file name without its suffix, see load_best_known,
+    defaults to the best_known.txt or best_known.json of the directory if any
+    output : str
+    JSON lines file the stats of every instance are appended to as soon as it is solved
+    kwargs
+    passed to solve_instance
+    Returns
+    ----------
+    list
+    stats of every instance, or its name, file, status "error", error and
+    traceback when it could not be read or solved
+    """
+    if best_known is None:
+        best_known = find_best_known(directory)
+    best_known_values = load_best_known(best_known)
+    results = []
+    for path in get_instances(directory, exclude=(best_known, output)):
+        key = os.path.splitext(os.path.basename(path))[0]
+        try:
+            stats = solve_instance(path, best_known=best_known_values.get(key), **kwargs)
+        except Exception as error:
+            stats = {"name": key, "file": path, "status": "error", "error": repr(error), "traceback": traceback.format_exc()}
+        if stats["status"] == "ok" and stats["best_known"] is None:
+            stats["best_known"] = best_known_values.get(stats["name"])
+            if stats["best_known"] is not None and stats["feasible"]:
+                stats["gap"] = float(exact.optimality_gap(stats["best_value"], stats["best_known"]))
+        results.append(stats)
+        if output is not None:
+            with open(output, "a") as f:
+                f.write(json.dumps(stats) + "\n")
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', type=str, help='Directory of benchmark files.')
+    parser.add_argument('--best_known', type=str, default=None, help='JSON or "name value" file of best-known values, defaults to best_known.txt or best_known.json in the directory.')
+    parser.add_argument('--vehicles', type=int, default=None, help='Solve with up to this many vehicles, 1 for a single route, defaults to the VEHICLES of every instance or to the fewest vehicles holding its demand.')
+    parser.add_argument('--N_iter', type=int, default=10, help='Non-improving iterations before a search terminates.')
+    parser.add_argument('--time_limit', type=float, default=None, help='Wall-clock budget in seconds of every single route search.')
+    parser.add_argument('--precision', type=int, default=None, help='Decimals the distances are rounded to.')
+    parser.add_argument('--candidate_k', type=int, default=None, help='Size of the nearest neighbor lists of the granular search.')
+    parser.add_argument('--output', type=str, default=None, help='JSON lines file the results are appended to.')
+    args = parser.parse_args()
+
+    results = run_suite(
+        args.directory,
+        best_known=args.best_known,
+        output=args.output,
+        vehicles=args.vehicles,
+        N_iter=args.N_iter,
+        time_limit=args.time_limit,
+        precision=args.precision,
+        candidate_k=args.candidate_k,
+    )
+
+    print(f"{'instance': <16} {'customers': >9} {'runtime': >8} {'iterations': >10} {'iter/s': >9} {'feasible': >8} {'best_value': >12} {'best_known': >12} {'gap': >8}")
+    for run in results:
+        if run["status"] != "ok":
+            print(f"{run['name']: <16} error: {run['error']}")
+            continue
+        best_known = "-" if run["best_known"] is None else f"{run['best_known']:.2f}"
+        gap = "-" if run["gap"] is None else f"{run['gap']:.2%}"
+        print(f"{run['name']: <16} {run['customers']: >9} {run['runtime']: >8.3f} {run['iterations']: >10} {run['iterations_per_second']: >9.1f} {str(run['feasible']): >8} {run['best_value']: >12.2f} {best_known: >12} {gap: >8}")
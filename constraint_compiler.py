@@ -0,0 +1,247 @@
+import re
+import numpy as np
+
+
+_COMPARATOR = re.compile(r"\s*(==|<=|>=)\s*")
+_TERM = re.compile(r"([+-]?)\s*([^+-]+)")
+_VARIABLE = re.compile(r"^([XYZ])\[(\d+)\]\[(\d+)\]$")
+_VECTOR = re.compile(r"^([PD])\[(\d+)\]$")
+_MATRIX = re.compile(r"^C\[(\d+)\]\[(\d+)\]$")
+_BINARY = re.compile(r"^\s*([XYZ])\[(\d+)\]\[(\d+)\]\s+in\s+\{\s*0\s*,\s*1\s*\}\s*$")
+
+# families are checked in this order, cheapest and most selective first
+FAMILY_ORDER = ["degree", "degree_bound", "flow_conservation", "capacity", "load_flow", "nonnegativity", "binary", "linear", "expression"]
+
+
+class ConstraintFamily(object):
+    """Batch of linear constraints sharing the same shape
+
+    Every row is stored as ``sum(coef * v[col]) (sense) rhs`` in coordinate
+    form, where ``v`` is the concatenation of the flattened X, Y and Z
+    matrices, so the whole family is evaluated with a single ``np.bincount``.
+    """
+    def __init__(self, name, indices, rows, cols, coefs, rhs, senses):
+        self.name = name
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.coefs = np.asarray(coefs, dtype=float)
+        self.rhs = np.asarray(rhs, dtype=float)
+        self.senses = np.asarray(senses, dtype="<U2")
+
+    def __len__(self):
+        return len(self.indices)
+
+    def evaluate(self, v, tol=1e-6):
+        """Returns the left hand side of every row and the mask of violated rows
+        """
+        lhs = np.bincount(self.rows, weights=self.coefs * v[self.cols], minlength=len(self))
+        violated = np.zeros(len(self), dtype=bool)
+        eq = self.senses == "=="
+        le = self.senses == "<="
+        ge = self.senses == ">="
+        violated[eq] = np.abs(lhs[eq] - self.rhs[eq]) > tol
+        violated[le] = lhs[le] > self.rhs[le] + tol
+        violated[ge] = lhs[ge] < self.rhs[ge] - tol
+        return lhs, violated
+
+
+class CompiledConstraints(object):
+    """Vectorized form of the CONSTRAINTS string list of an instance
+
+    The strings are parsed once into constraint families (degree equalities,
+    flow conservation, the ``Y + Z <= Q * X`` capacity family, ...). Strings
+    that cannot be parsed as linear expressions are kept and evaluated with
+    ``eval`` as before.
+    """
+    def __init__(self, constraints, vertices_num, families, binary, expressions):
+        self.constraints = constraints
+        self.vertices_num = vertices_num
+        self.families = families
+        self.binary = binary
+        self.expressions = expressions
+
+    def __len__(self):
+        return len(self.constraints)
+
+    def __str__(self):
+        counts = ", ".join([f"{family.name}={len(family)}" for family in self.families])
+        if len(self.binary):
+            counts += f", binary={len(self.binary[0])}"
+        if len(self.expressions):
+            counts += f", expression={len(self.expressions)}"
+        return f"CompiledConstraints({counts})"
+
+    def check(self, X, Y, Z, C=None, P=None, D=None, Q=None, first_only=False):
+        """Check the flow matrices against every constraint
+        Parameters
+        ----------
+        X, Y, Z : np.ndarray
+        edge, pickup flow and delivery flow matrices of a path
+        C, P, D, Q : optional
+        instance data, only needed by constraints kept as expressions
+        first_only : bool
+        stop at the first violated family
+        Returns
+        ----------
+        (bool, list)
+        whether all constraints hold and the list of violations, each one a
+        dict with the constraint index, family, string and the lhs (variable
+        terms moved to the left) and rhs of the compiled row
+        """
+        v = np.concatenate([np.ravel(X), np.ravel(Y), np.ravel(Z)]).astype(float)
+        violations = []
+        for family in self.families:
+            lhs, violated = family.evaluate(v)
+            for row in np.flatnonzero(violated):
+                idx = int(family.indices[row])
+                violations.append({
+                    "index": idx,
+                    "family": family.name,
+                    "constraint": self.constraints[idx],
+                    "lhs": float(lhs[row]),
+                    "rhs": float(family.rhs[row]),
+                })
+            if first_only and violations:
+                return False, violations
+
+        if len(self.binary):
+            indices, cols = self.binary
+            values = v[cols]
+            for row in np.flatnonzero((values != 0) & (values != 1)):
+                idx = int(indices[row])
+                violations.append({
+                    "index": idx,
+                    "family": "binary",
+                    "constraint": self.constraints[idx],
+                    "lhs": float(values[row]),
+                    "rhs": None,
+                })
+            if first_only and violations:
+                return False, violations
+
+        for idx, constraint in self.expressions:
+            if eval(constraint) == False:
+                violations.append({
+                    "index": idx,
+                    "family": "expression",
+                    "constraint": constraint,
+                    "lhs": None,
+                    "rhs": None,
+                })
+                if first_only:
+                    return False, violations
+
+        return len(violations) == 0, violations
+
+
+def _parse_side(side, vertices_num, values):
+    """Parse a sum of terms into ({variable column: coefficient}, constant)
+    """
+    terms = {}
+    constant = 0.0
+    side = side.strip()
+    if not side:
+        raise ValueError("Empty expression")
+    position = 0
+    for match in _TERM.finditer(side):
+        if side[position:match.start()].strip():
+            raise ValueError(f"Cannot parse {side}")
+        position = match.end()
+        sign = -1.0 if match.group(1) == "-" else 1.0
+        coef = sign
+        column = None
+        for factor in match.group(2).split("*"):
+            factor = factor.strip()
+            variable = _VARIABLE.match(factor)
+            vector = _VECTOR.match(factor)
+            matrix = _MATRIX.match(factor)
+            if variable:
+                if column is not None:
+                    raise ValueError(f"Non linear term in {side}")
+                name, i, j = variable.group(1), int(variable.group(2)), int(variable.group(3))
+                column = "XYZ".index(name) * vertices_num**2 + i * vertices_num + j
+            elif vector:
+                coef *= float(values[vector.group(1)][int(vector.group(2))])
+            elif matrix:
+                coef *= float(values["C"][int(matrix.group(1))][int(matrix.group(2))])
+            elif factor == "Q":
+                coef *= float(values["Q"])
+            else:
+                coef *= float(factor)
+        if column is None:
+            constant += coef
+        else:
+            terms[column] = terms.get(column, 0.0) + coef
+    if side[position:].strip():
+        raise ValueError(f"Cannot parse {side}")
+    return terms, constant
+
+
+def _classify(terms, sense, rhs, vertices_num):
+    names = {"XYZ"[column // vertices_num**2] for column in terms}
+    coefs = list(terms.values())
+    if names == {"X"}:
+        if sense == "==" and all(coef > 0 for coef in coefs):
+            return "degree"
+        if sense == "==":
+            return "flow_conservation"
+        return "degree_bound"
+    if "X" in names:
+        return "capacity"
+    if len(terms) == 1 and sense == ">=" and rhs == 0 and coefs[0] > 0:
+        return "nonnegativity"
+    if sense == "==":
+        return "load_flow"
+    return "linear"
+
+
+def compile_constraints(constraints, vertices_num, cost=None, pickup=None, delivery=None, capacity=None):
+    """Compile the CONSTRAINTS string list of an instance into CompiledConstraints
+
+    Constants (``Q``, ``P[i]``, ``D[i]``, ``C[i][j]``) are resolved with the
+    given instance data at compile time.
+    """
+    values = {"C": cost, "P": pickup, "D": delivery, "Q": capacity}
+    grouped = {}
+    binary_indices, binary_cols = [], []
+    expressions = []
+
+    for idx, constraint in enumerate(constraints):
+        binary = _BINARY.match(constraint)
+        if binary:
+            name, i, j = binary.group(1), int(binary.group(2)), int(binary.group(3))
+            binary_indices.append(idx)
+            binary_cols.append("XYZ".index(name) * vertices_num**2 + i * vertices_num + j)
+            continue
+        try:
+            parts = _COMPARATOR.split(constraint)
+            if len(parts) != 3:
+                raise ValueError(f"Expected a single comparison in {constraint}")
+            lhs, sense, rhs = parts
+            lhs_terms, lhs_constant = _parse_side(lhs, vertices_num, values)
+            rhs_terms, rhs_constant = _parse_side(rhs, vertices_num, values)
+        except (ValueError, TypeError, IndexError):
+            expressions.append((idx, constraint))
+            continue
+
+        terms = dict(lhs_terms)
+        for column, coef in rhs_terms.items():
+            terms[column] = terms.get(column, 0.0) - coef
+        terms = {column: coef for column, coef in terms.items() if coef != 0}
+        rhs_value = rhs_constant - lhs_constant
+        family = _classify(terms, sense, rhs_value, vertices_num) if terms else "linear"
+
+        group = grouped.setdefault(family, {"indices": [], "rows": [], "cols": [], "coefs": [], "rhs": [], "senses": []})
+        row = len(group["indices"])
+        group["indices"].append(idx)
+        group["rhs"].append(rhs_value)
+        group["senses"].append(sense)
+        for column, coef in terms.items():
+            group["rows"].append(row)
+            group["cols"].append(column)
+            group["coefs"].append(coef)
+
+    families = [ConstraintFamily(name, **grouped[name]) for name in FAMILY_ORDER if name in grouped]
+    binary = (np.array(binary_indices, dtype=np.int64), np.array(binary_cols, dtype=np.int64)) if binary_indices else ()
+    return CompiledConstraints(list(constraints), vertices_num, families, binary, expressions)
@@ -0,0 +1,245 @@
+import heapq
+import numpy as np
+
+import feasibility
+
+
+def route_max_load(route, pickup, delivery):
+    """Max load along a route, see feasibility.LoadProfile
+    """
+    nodes = np.asarray(route)[:-1]
+    return float(delivery[nodes].sum() + np.cumsum(pickup[nodes] - delivery[nodes]).max())
+
+
+def nearest_neighbor(cost, pickup, delivery, capacity):
+    """Route visiting the nearest unvisited customer whose visit keeps the load within capacity
+
+    The vehicle leaves the depot with every delivery on board and each visit
+    changes the load by pickup - delivery. When no customer fits, the one
+    with the smallest load increase is visited. O(N^2).
+    """
+    n = len(cost)
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    balance = pickup - delivery
+    load = delivery[1:].sum()
+    route = [0]
+    current = 0
+    for _ in range(n - 1):
+        fits = ~visited & (load + balance <= capacity)
+        if not fits.any():
+            fits = ~visited & (balance == balance[~visited].min())
+        distances = np.where(fits, cost[current], np.inf)
+        current = int(np.argmin(distances))
+        visited[current] = True
+        load += balance[current]
+        route.append(current)
+    return route + [0]
+
+
+def cheapest_insertion(cost, pickup, delivery, capacity):
+    """Route built by repeatedly inserting the customer with the cheapest feasible insertion
+
+    Every customer keeps its cheapest insertion edge in a heap. After an
+    insertion only the new edges are compared against the cached ones, and a
+    customer is fully re-evaluated (O(N), vectorized) only when its cached
+    edge disappeared or is no longer load-feasible, which keeps the whole
+    construction around O(N^2 log N). Customers that fit nowhere are
+    inserted at their cheapest position regardless of the load.
+    """
+    n = len(cost)
+    route = [0, 0]
+    customers = np.arange(1, n)
+    # cached best insertion of every customer: the node it follows and the cost increase
+    after = np.zeros(n, dtype=np.int64)
+    increase = cost[0, :] + cost[:, 0] - cost[0, 0]
+    version = np.zeros(n, dtype=np.int64)
+    heap = [(float(increase[u]), int(u), 0) for u in customers]
+    heapq.heapify(heap)
+    inserted = np.zeros(n, dtype=bool)
+    inserted[0] = True
+    path = np.asarray(route)
+    profile = feasibility.LoadProfile(path, pickup, delivery, capacity)
+    position = {0: 0}
+    forced = []
+
+    def best_insertions(nodes):
+        """Cheapest load-feasible insertion of every node, as (after, increase) arrays, inf when none fits
+        """
+        t = np.arange(len(path) - 1)[None, :]
+        u = nodes[:, None]
+        costs = cost[path[t], u] + cost[u, path[t + 1]] - cost[path[t], path[t + 1]]
+        costs = np.where(profile.insertion_max_load(t, u) <= capacity, costs, np.inf)
+        k = np.argmin(costs, axis=1)
+        return path[k], costs[np.arange(len(nodes)), k]
+
+    while heap:
+        value, u, stamp = heapq.heappop(heap)
+        if inserted[u] or stamp != version[u]:
+            continue
+        a = int(after[u])
+        t = position.get(a)
+        if t is None or t >= len(route) - 1 or profile.insertion_max_load(t, u) > capacity:
+            # the cached edge is gone or the load does not fit there anymore
+            best_after, best_increase = best_insertions(np.array([u]))
+            version[u] += 1
+            if best_increase[0] == np.inf:
+                forced.append(u)
+                inserted[u] = True
+                continue
+            after[u], increase[u] = best_after[0], best_increase[0]
+            heapq.heappush(heap, (float(increase[u]), u, int(version[u])))
+            continue
+
+        b = route[t + 1]
+        route.insert(t + 1, u)
+        inserted[u] = True
+        position = {node: idx for idx, node in enumerate(route[:-1])}
+        path = np.asarray(route)
+        profile = feasibility.LoadProfile(path, pickup, delivery, capacity)
+
+        # compare the two new edges (a, u) and (u, b) against the cached insertions
+        remaining = customers[~inserted[customers]]
+        if not len(remaining):
+            continue
+        broken = remaining[(after[remaining] == a)]
+        others = remaining[(after[remaining] != a)]
+        for start, end in ((a, u), (u, b)):
+            costs = cost[start, others] + cost[others, end] - cost[start, end]
+            better = costs < increase[others]
+            changed = others[better]
+            after[changed] = start
+            increase[changed] = costs[better]
+            version[changed] += 1
+            for v in changed:
+                heapq.heappush(heap, (float(increase[v]), int(v), int(version[v])))
+        if len(broken):
+            after[broken], increase[broken] = best_insertions(broken)
+            version[broken] += 1
+            for v in broken:
+                heapq.heappush(heap, (float(increase[v]), int(v), int(version[v])))
+
+    for u in forced:
+        path = np.asarray(route)
+        t = np.arange(len(path) - 1)
+        k = int(np.argmin(cost[path[t], u] + cost[u, path[t + 1]] - cost[path[t], path[t + 1]]))
+        route.insert(k + 1, u)
+    return route
+
+
+def savings_routes(cost, pickup, delivery, capacity, neighbors=100):
+    """Clarke-Wright savings routes that each keep the load within capacity
+
+    Routes start as [0, i, 0] and are merged end to start in decreasing order
+    of the saving C[i][0] + C[0][j] - C[i][j]. Appending route B to route A
+    carries the deliveries of B through A and the pickups of A through B, so
+    the merged max load is max(max_A + D_B, max_B + P_A), an O(1) check.
+    neighbors limits the candidate pairs to the k cheapest arcs of each
+    customer to bound the memory on large instances, None uses every pair.
+    """
+    n = len(cost)
+    customers = np.arange(1, n)
+    if neighbors is None or neighbors >= n - 2:
+        i, j = np.meshgrid(customers, customers, indexing="ij")
+        i, j = i.ravel(), j.ravel()
+    else:
+        sub = cost[1:, 1:].astype(float) + np.diag(np.full(n - 1, np.inf))
+        nearest = np.argpartition(sub, neighbors, axis=1)[:, :neighbors] + 1
+        i = np.repeat(customers, neighbors)
+        j = nearest.ravel()
+    keep = i != j
+    i, j = i[keep], j[keep]
+    savings = cost[i, 0] + cost[0, j] - cost[i, j]
+    order = np.argsort(-savings, kind="stable")
+
+    route_of = np.arange(n)
+    routes = {u: [u] for u in customers.tolist()}
+    max_load = {u: float(max(delivery[u], pickup[u])) for u in customers.tolist()}
+    picked = {u: float(pickup[u]) for u in customers.tolist()}
+    dropped = {u: float(delivery[u]) for u in customers.tolist()}
+    for k in order:
+        if savings[k] <= 0:
+            break
+        u, v = int(i[k]), int(j[k])
+        a, b = int(route_of[u]), int(route_of[v])
+        # u must end route a and v must start route b
+        if a == b or routes[a][-1] != u or routes[b][0] != v:
+            continue
+        merged_load = max(max_load[a] + dropped[b], max_load[b] + picked[a])
+        if merged_load > capacity:
+            continue
+        routes[a] += routes[b]
+        max_load[a] = merged_load
+        picked[a] += picked.pop(b)
+        dropped[a] += dropped.pop(b)
+        route_of[routes.pop(b)] = a
+        max_load.pop(b)
+    return [[0] + route + [0] for route in routes.values()]
+
+
+def savings(cost, pickup, delivery, capacity, neighbors=100):
+    """Single route joining the savings routes one after the other
+
+    The next route is the one giving the lowest max load once appended (same
+    O(1) rule as in savings_routes), ties broken by the connecting arc.
+    """
+    routes = savings_routes(cost, pickup, delivery, capacity, neighbors=neighbors)
+    max_load = np.array([route_max_load(route, pickup, delivery) for route in routes])
+    picked = np.array([pickup[route].sum() for route in routes], dtype=float)
+    dropped = np.array([delivery[route].sum() for route in routes], dtype=float)
+    firsts = np.array([route[1] for route in routes])
+    remaining = np.ones(len(routes), dtype=bool)
+    tour = [0]
+    tour_max, tour_picked = -np.inf, 0.0
+    for _ in range(len(routes)):
+        joined = np.maximum(tour_max + dropped, max_load + tour_picked)
+        order = np.lexsort((cost[tour[-1], firsts], np.where(remaining, joined, np.inf)))
+        r = int(order[0])
+        remaining[r] = False
+        tour += routes[r][1:-1]
+        tour_max = joined[r]
+        tour_picked += picked[r]
+    return tour + [0]
+
+
+def insert_node(route, node, cost, pickup, delivery, capacity):
+    """Copy of route with node inserted at its cheapest load-feasible position
+
+    The node is inserted at its cheapest position regardless of the load
+    when it fits nowhere. O(N), vectorized.
+    """
+    path = np.asarray(route)
+    profile = feasibility.LoadProfile(path, pickup, delivery, capacity)
+    t = np.arange(len(path) - 1)
+    costs = cost[path[t], node] + cost[node, path[t + 1]] - cost[path[t], path[t + 1]]
+    feasible = profile.insertion_max_load(t, node) <= capacity
+    k = int(np.argmin(np.where(feasible, costs, np.inf))) if feasible.any() else int(np.argmin(costs))
+    return [int(n) for n in path[:k + 1]] + [int(node)] + [int(n) for n in path[k + 1:]]
+
+
+def repair_route(route, nodes, cost, pickup, delivery, capacity):
+    """Copy of route with the given nodes taken out and inserted back one by one with insert_node
+
+    Nodes that are not on the route are only inserted.
+    """
+    nodes = [int(node) for node in nodes]
+    removed = set(nodes)
+    route = [int(node) for node in route if node not in removed or node == 0]
+    for node in nodes:
+        route = insert_node(route, node, cost, pickup, delivery, capacity)
+    return route
+
+
+CONSTRUCTIONS = {
+    "cheapest_insertion": cheapest_insertion,
+    "savings": savings,
+    "nearest_neighbor": nearest_neighbor,
+}
+
+
+def construct_route(method, cost, pickup, delivery, capacity):
+    """Build an initial route [0, ..., 0] with one of the CONSTRUCTIONS
+    """
+    if method not in CONSTRUCTIONS:
+        raise ValueError(f"Unknown construction: {method}. Use one of {', '.join(CONSTRUCTIONS)}.")
+    return [int(node) for node in CONSTRUCTIONS[method](cost, pickup, delivery, capacity)]
@@ -0,0 +1,205 @@
+import time
+import queue
+import argparse
+import traceback
+import multiprocessing
+import numpy as np
+
+import lp
+from ts import Tabu_Search
+from multistart import get_start_configs
+
+
+class ElitePool(object):
+    """Fixed-size pool of the best distinct solutions, shared between worker processes
+
+    Paths and values live in shared memory arrays guarded by a lock, so
+    workers exchange solutions without a server process.
+    """
+    def __init__(self, size, path_length, context=multiprocessing):
+        self.size = size
+        self.path_length = path_length
+        self.lock = context.Lock()
+        self.values = context.RawArray("d", [np.inf] * size)
+        self.paths = context.RawArray("q", size * path_length)
+
+    def _arrays(self):
+        values = np.frombuffer(self.values, dtype=np.float64)
+        paths = np.frombuffer(self.paths, dtype=np.int64).reshape(self.size, self.path_length)
+        return values, paths
+
+    def publish(self, path, value):
+        """Add a solution if it is distinct and better than the worst elite one
+        Returns
+        ----------
+        bool
+        whether the solution entered the pool
+        """
+        path = np.asarray(path, dtype=np.int64)
+        with self.lock:
+            values, paths = self._arrays()
+            used = np.isfinite(values)
+            if np.any(used & np.all(paths == path, axis=1)):
+                return False
+            worst = int(np.argmax(values))
+            if value >= values[worst]:
+                return False
+            values[worst] = value
+            paths[worst] = path
+            return True
+
+    def get_solutions(self):
+        """Elite solutions as (value, path) pairs, best first
+        """
+        with self.lock:
+            values, paths = self._arrays()
+            solutions = [(float(values[k]), paths[k].tolist()) for k in range(self.size) if np.isfinite(values[k])]
+        return sorted(solutions, key=lambda solution: solution[0])
+
+    def get_restart(self, exclude=()):
+        """Best elite path not in exclude, or None
+        """
+        for value, path in self.get_solutions():
+            if tuple(path) not in exclude:
+                return path
+        return None
+
+
+def failed_start(config, error, start_time=None):
+    """Stats of a worker whose search raised or died, ranked after every finished one
+    """
+    stats = {key: value for key, value in config.items() if key != "initial_solution"}
+    stats.update({
+        "best_path": [],
+        "best_value": np.inf,
+        "feasible": False,
+        "iterations": 0,
+        "restarts_done": 0,
+        "runtime": time.perf_counter() - start_time if start_time is not None else 0.0,
+        "error": error,
+    })
+    return stats
+
+
+def run_cooperative_start(problem, config, elite, results):
+    """Worker process: tabu search publishing to and restarting from the elite pool
+
+    A search that raises puts the stats of failed_start instead, so that
+    cooperative_search still gets one result per worker.
+    """
+    start_time = time.perf_counter()
+    try:
+        stats = _cooperative_start(problem, config, elite, start_time)
+    except Exception:
+        stats = failed_start(config, traceback.format_exc(), start_time)
+    results.put(stats)
+
+
+def _cooperative_start(problem, config, elite, start_time):
+    used = set()
+
+    def restart_solution():
+        if ts.restarts >= config["restarts"]:
+            return None
+        # never restart from the worker's own best solution or from the same elite solution twice
+        path = elite.get_restart(exclude=used | {tuple(ts.best_solution)})
+        if path is not None:
+            used.add(tuple(path))
+        return path
+
+    ts = Tabu_Search(
+        problem,
+        N_iter=config["N_iter"],
+        tabu_tenure=config["tabu_tenure"],
+        penalty_value=config["penalty_value"],
+        initial_solution=config["initial_solution"],
+        time_limit=config["time_limit"],
+        on_improvement=elite.publish,
+        restart_solution=restart_solution,
+        verbosity="quiet",
+    )
+    ts.run()
+    stats = {key: value for key, value in config.items() if key != "initial_solution"}
+    stats.update({
+        "best_path": [int(node) for node in ts.get_best_solution()],
+        "best_value": float(ts.best_value),
+        "feasible": bool(ts.check_constraints(ts.get_best_solution())),
+        "iterations": int(ts.iterations),
+        "restarts_done": int(ts.restarts),
+        "runtime": time.perf_counter() - start_time,
+    })
+    return stats
+
+
+def cooperative_search(problem, workers=4, seed=0, restarts=3, elite_size=8, tabu_tenures=(3, 5, 7, 10), penalty_values=(5, 50, 500, 5000), N_iter=10, time_limit=None):
+    """Run tabu searches at the same time that share their best solutions
+
+    Every worker publishes its improving solutions to an ElitePool. When a
+    worker stagnates (N_iter non-improving iterations) it restarts from the
+    best elite solution it has not used yet, up to restarts times, keeping
+    its frequency memory so that the penalties steer it away from the
+    moves it already explored. A worker that raises or dies is reported
+    with an "error" and an infinite best_value rather than waited for.
+    Returns
+    ----------
+    (dict, list, list)
+    stats of the best worker, stats of every worker and the final elite pool
+    """
+    configs = get_start_configs(problem, workers, seed=seed, tabu_tenures=tabu_tenures, penalty_values=penalty_values, N_iter=N_iter, time_limit=time_limit)
+    for config in configs:
+        config["restarts"] = restarts
+
+    context = multiprocessing.get_context()
+    elite = ElitePool(elite_size, len(problem.cost) + 1, context=context)
+    results = context.Queue()
+    processes = [context.Process(target=run_cooperative_start, args=(problem, config, elite, results)) for config in configs]
+    for process in processes:
+        process.start()
+    runs = []
+    pending = {config["start"]: process for config, process in zip(configs, processes)}
+    while pending:
+        # workers that were dead before the get have their result, if any, already queued
+        dead = [start for start, process in pending.items() if not process.is_alive()]
+        try:
+            run = results.get(timeout=0.1)
+        except queue.Empty:
+            for start in dead:
+                config = next(config for config in configs if config["start"] == start)
+                runs.append(failed_start(config, f"Worker exited with code {pending.pop(start).exitcode} without a result."))
+        else:
+            pending.pop(run["start"], None)
+            runs.append(run)
+    for process in processes:
+        process.join()
+
+    runs = sorted(runs, key=lambda run: run["start"])
+    best = min(runs, key=lambda run: (not run["feasible"], run["best_value"], run["start"]))
+    return best, runs, elite.get_solutions()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4, help='Number of cooperating tabu searches.')
+    parser.add_argument('--restarts', type=int, default=3, help='Restarts from the elite pool allowed per worker.')
+    parser.add_argument('--elite_size', type=int, default=8, help='Number of solutions kept in the elite pool.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the worker configurations.')
+    parser.add_argument('--N_iter', type=int, default=10, help='Non-improving iterations before a worker restarts.')
+    parser.add_argument('--time_limit', type=float, default=None, help='Wall-clock budget in seconds of every worker.')
+    args = parser.parse_args()
+
+    problem = lp.construct_problem()
+    best, runs, elite = cooperative_search(problem, workers=args.workers, seed=args.seed, restarts=args.restarts, elite_size=args.elite_size, N_iter=args.N_iter, time_limit=args.time_limit)
+
+    print(f"{'start': >5} {'tenure': >6} {'penalty': >9} {'restarts': >8} {'iterations': >10} {'runtime': >8} {'best_value': >12}  best_path")
+    for run in runs:
+        print(f"{run['start']: >5} {run['tabu_tenure']: >6} {run['penalty_value']: >9} {run['restarts_done']: >8} {run['iterations']: >10} {run['runtime']: >8.3f} {run['best_value']: >12}  {run['best_path']}")
+    print()
+    print("Elite pool:")
+    for value, path in elite:
+        print(f"{value: >12}  {path}")
+    print()
+    print("Best solution (cooperative tabu search)")
+    print("Start:", best["start"])
+    print("Path:", best["best_path"])
+    print("Value:", best["best_value"])
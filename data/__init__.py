@@ -1,24 +1,50 @@
-from . import instance_one, instance_two, create_instance
+import os
 
-def get(instance: str, seed=None):
-    if instance == "instance_one":
+from . import instance_one, instance_two, storage, benchmark
+from .create_instance import create_instance
+
+def get(instance: str, seed=None, symbolic=None, mmap=True, **options):
+    """Returns G, COST, OBJ_FUNC, CONSTRAINTS, PICKUP, DELIVERY, CAPACITY of an instance
+
+    instance is the name of a bundled instance or the path of an instance
+    saved with data.storage.save_instance, whose arrays are memory-mapped
+    unless mmap is False, or the path of a benchmark file read with
+    data.benchmark.load_benchmark. With symbolic=False, G, OBJ_FUNC and
+    CONSTRAINTS are returned as None and are not built for stored,
+    benchmark or generated instances. symbolic defaults to True for the
+    bundled instances only, whose strings the reference evaluation of
+    ts.py uses, and to False for every other instance, so large ones do
+    not build O(N^2) strings unless asked to. "create_instance" generates a random
+    instance from seed, options (customers, coordinates, tightness, ...)
+    are passed to data.create_instance.create_instance.
+    """
+    if storage.is_instance(instance):
+        _instance = storage.load_instance(instance, mmap=mmap)
+    elif os.path.isfile(instance):
+        _instance = benchmark.load_benchmark(instance)
+    elif instance == "instance_one":
         _instance = instance_one
     elif instance == "instance_two":
         _instance = instance_two
     elif instance == "create_instance":
         if seed is not None and type(seed) == int:
-            _instance = create_instance(seed=seed)
+            _instance = create_instance(seed=seed, **options)
             _instance.create()
         else:
-            _instance = create_instance()
+            _instance = create_instance(**options)
             _instance.create()
     else:
         return "No instance found"
             
-    G = _instance.G
+    if symbolic is None:
+        symbolic = instance in ("instance_one", "instance_two")
+    if symbolic:
+        G = _instance.G
+        OBJ_FUNC = _instance.OBJ_FUNC
+        CONSTRAINTS = _instance.CONSTRAINTS
+    else:
+        G = OBJ_FUNC = CONSTRAINTS = None
     COST = _instance.COST
-    OBJ_FUNC = _instance.OBJ_FUNC
-    CONSTRAINTS = _instance.CONSTRAINTS
     PICKUP = _instance.PICKUP
     DELIVERY = _instance.DELIVERY
     CAPACITY = _instance.CAPACITY
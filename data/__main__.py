@@ -0,0 +1,9 @@
+import sys
+
+from . import get, storage
+
+
+if __name__ == "__main__":
+    # python -m data instance_two path/to/instance_two
+    G, COST, OBJ_FUNC, CONSTRAINTS, PICKUP, DELIVERY, CAPACITY = get(sys.argv[1], symbolic=False)
+    print(storage.save_instance(sys.argv[2], COST, PICKUP, DELIVERY, CAPACITY, name=sys.argv[1]))
@@ -0,0 +1,210 @@
+import os
+import numpy as np
+
+from . import symbolic
+
+
+class EuclideanCost(object):
+    """Cost matrix of Euclidean distances between coordinates, computed on demand
+
+    Behaves like the (N, N) cost array for the indexing the solvers use
+    (cost[i, j] with ints, slices or broadcast index arrays, cost[i] for a
+    row), so only the requested entries are computed and the full matrix
+    is never stored. np.asarray(cost) materializes it, e.g. for the
+    networkx graph or to share it with worker processes.
+    """
+    def __init__(self, coordinates, precision=None):
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        self.precision = precision
+        self.shape = (len(self.coordinates), len(self.coordinates))
+        self.ndim = 2
+        self.dtype = np.dtype(float)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        nodes = np.arange(len(self))
+        rows, cols = nodes[key[0]], nodes[key[1]]
+        if isinstance(key[0], slice) or isinstance(key[1], slice):
+            # a slice spans its own axis, as in numpy indexing
+            rows = np.reshape(rows, np.shape(rows) + (1,) * np.ndim(cols))
+        difference = self.coordinates[rows] - self.coordinates[cols]
+        distances = np.hypot(difference[..., 0], difference[..., 1])
+        if self.precision is not None:
+            distances = np.round(distances, self.precision)
+        return distances if np.ndim(distances) else float(distances)
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self[:, :]
+        return matrix if dtype is None else matrix.astype(dtype)
+
+    def __repr__(self):
+        return f"EuclideanCost(nodes={len(self)}, precision={self.precision})"
+
+
+class BenchmarkInstance(symbolic.SymbolicInstance):
+    """Instance read from a benchmark text file, see load_benchmark
+    """
+    def __init__(self, name, coordinates, pickup, delivery, capacity, best_known=None, vehicles=None, precision=None):
+        self.name = name
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        self.COST = EuclideanCost(self.coordinates, precision=precision)
+        self.PICKUP = np.asarray(pickup)
+        self.DELIVERY = np.asarray(delivery)
+        self.CAPACITY = capacity
+        self.best_known = best_known
+        self.vehicles = vehicles
+
+
+def _number(token):
+    value = float(token)
+    return int(value) if value.is_integer() else value
+
+
+def _demands(values):
+    values = np.asarray(values, dtype=float)
+    return values.astype(np.int64) if np.all(values == np.round(values)) else values
+
+
+def parse_keyword_format(lines):
+    """TSPLIB-like format
+
+        NAME : SCA3-0
+        DIMENSION : 51
+        CAPACITY : 500
+        EDGE_WEIGHT_TYPE : EUC_2D
+        BEST_KNOWN : 636.06
+        VEHICLES : 4
+        NODE_COORD_SECTION
+        1 40 40
+        ...
+        PICKUP_SECTION
+        1 0
+        ...
+        DELIVERY_SECTION
+        1 0
+        ...
+        DEPOT_SECTION
+        1
+        -1
+        EOF
+
+    Node ids are renumbered from 0 with the depot first. A DEMAND_SECTION
+    with "id delivery pickup" rows can replace the PICKUP and DELIVERY
+    sections.
+    """
+    header = {}
+    sections = {}
+    section = None
+    for line in lines:
+        if ":" in line:
+            key, value = (part.strip() for part in line.split(":", 1))
+            header[key.upper()] = value
+            section = None
+        elif line.upper().endswith("_SECTION"):
+            section = line.upper()
+            sections[section] = []
+        elif line.upper() == "EOF":
+            break
+        elif section is not None:
+            sections[section].append([_number(token) for token in line.split()])
+        else:
+            raise ValueError(f"Unexpected line in benchmark file: {line}")
+
+    edge_weight_type = header.get("EDGE_WEIGHT_TYPE", "EUC_2D").upper()
+    if edge_weight_type != "EUC_2D":
+        raise ValueError(f"Unsupported EDGE_WEIGHT_TYPE: {edge_weight_type}. Only EUC_2D is supported.")
+    if "NODE_COORD_SECTION" not in sections:
+        raise ValueError("Benchmark file has no NODE_COORD_SECTION.")
+
+    ids = [int(row[0]) for row in sections["NODE_COORD_SECTION"]]
+    depot = ids[0]
+    if "DEPOT_SECTION" in sections:
+        depot = int(sections["DEPOT_SECTION"][0][0])
+    order = [depot] + [node for node in ids if node != depot]
+    index = {node: idx for idx, node in enumerate(order)}
+
+    coordinates = np.zeros((len(order), 2))
+    pickup = np.zeros(len(order))
+    delivery = np.zeros(len(order))
+    for row in sections["NODE_COORD_SECTION"]:
+        coordinates[index[int(row[0])]] = row[1:3]
+    for row in sections.get("DEMAND_SECTION", []):
+        delivery[index[int(row[0])]], pickup[index[int(row[0])]] = row[1], row[2]
+    for row in sections.get("PICKUP_SECTION", []):
+        pickup[index[int(row[0])]] = row[1]
+    for row in sections.get("DELIVERY_SECTION", []):
+        delivery[index[int(row[0])]] = row[1]
+
+    if "DIMENSION" in header and int(header["DIMENSION"]) != len(order):
+        raise ValueError(f"DIMENSION is {header['DIMENSION']} but {len(order)} nodes have coordinates.")
+    best_known = header.get("BEST_KNOWN")
+    vehicles = header.get("VEHICLES")
+    return {
+        "name": header.get("NAME"),
+        "coordinates": coordinates,
+        "pickup": _demands(pickup),
+        "delivery": _demands(delivery),
+        "capacity": _number(header["CAPACITY"]),
+        "best_known": None if best_known is None else float(best_known),
+        "vehicles": None if vehicles is None else int(_number(vehicles)),
+    }
+
+
+def parse_column_format(lines):
+    """Column format of the Dethloff and Salhi-Nagy SPD instance files
+
+        50 500
+        0 40 40 0 0
+        1 22 22 18 12
+        ...
+
+    The first line holds the number of customers and the vehicle capacity
+    (further values, e.g. a route length limit, are ignored). Each following
+    line is "id x y delivery pickup", the depot first.
+    """
+    rows = [line.split() for line in lines]
+    customers, capacity = int(_number(rows[0][0])), _number(rows[0][1])
+    table = np.array([[float(token) for token in row[:5]] for row in rows[1:customers + 2]])
+    if len(table) != customers + 1 or table.shape[1] != 5:
+        raise ValueError(f"Expected {customers + 1} rows of 'id x y delivery pickup', got {len(table)}.")
+    order = np.argsort(table[:, 0], kind="stable")
+    table = table[order]
+    return {
+        "name": None,
+        "coordinates": table[:, 1:3],
+        "pickup": _demands(table[:, 4]),
+        "delivery": _demands(table[:, 3]),
+        "capacity": capacity,
+        "best_known": None,
+        "vehicles": None,
+    }
+
+
+def load_benchmark(path, precision=None):
+    """Read a VRPSPD benchmark file, in the keyword or in the column format
+    Parameters
+    ----------
+    path : str
+    path of the benchmark file
+    precision : int
+    decimals the distances are rounded to, None keeps the exact Euclidean distances
+    Returns
+    ----------
+    BenchmarkInstance
+    instance whose COST computes the distances between its coordinates on demand
+    """
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    lines = [line for line in lines if line and not line.startswith("#")]
+    if not lines:
+        raise ValueError(f"{path} is empty.")
+    if any(line.upper() == "NODE_COORD_SECTION" for line in lines):
+        parsed = parse_keyword_format(lines)
+    else:
+        parsed = parse_column_format(lines)
+    parsed["name"] = parsed["name"] or os.path.splitext(os.path.basename(path))[0]
+    return BenchmarkInstance(precision=precision, **parsed)
@@ -0,0 +1,102 @@
+import numpy as np
+
+from . import symbolic
+from .benchmark import EuclideanCost
+
+
+COORDINATES = ("euclidean", "clustered")
+
+
+def euclidean_matrix(coordinates, dtype=float, chunk_size=1024):
+    """Dense Euclidean distance matrix, built by broadcasting over blocks of rows
+
+    Blocks keep the temporaries at chunk_size * N entries, so 10,000
+    customers only ever hold the matrix itself.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    n = len(coordinates)
+    x, y = coordinates[:, 0], coordinates[:, 1]
+    matrix = np.empty((n, n), dtype=dtype)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        matrix[start:stop] = np.hypot(x[start:stop, None] - x[None, :], y[start:stop, None] - y[None, :])
+    return matrix
+
+
+class create_instance(symbolic.SymbolicInstance):
+    """Seeded random VRPSPD instance
+
+    Coordinates are drawn uniformly on a grid ("euclidean") or around
+    random cluster centers ("clustered"), the depot sits at the center of
+    the grid. Every customer gets a demand split between delivery and
+    pickup by a random ratio (as in the Salhi-Nagy instances). The capacity
+    is set so that max(total delivery, total pickup) fills the given number
+    of vehicles up to tightness, so tightness=1 with vehicles=1 leaves a
+    single route no slack at all. The same seed always gives the same
+    instance. G, OBJ_FUNC and CONSTRAINTS are only built when accessed.
+    Parameters
+    ----------
+    seed : int
+    seed of the random generator, None for a random instance
+    customers : int
+    number of customers, the instance has customers + 1 nodes
+    coordinates : str
+    "euclidean" or "clustered"
+    clusters : int
+    number of clusters of the "clustered" coordinates
+    tightness : float
+    ratio in (0, 1] of the total demand to the capacity of the vehicles
+    vehicles : int
+    number of vehicles the capacity is sized for
+    max_demand : int
+    demands (delivery + pickup) are drawn in [1, max_demand]
+    grid : float
+    side of the square the coordinates are drawn in
+    dense : bool
+    whether COST is a dense matrix or an EuclideanCost computing distances on demand
+    """
+    def __init__(self, seed=None, customers=10, coordinates="euclidean", clusters=5, tightness=0.8, vehicles=1, max_demand=50, grid=100.0, dense=True):
+        if coordinates not in COORDINATES:
+            raise ValueError(f"Unknown coordinates: {coordinates}. Use one of {', '.join(COORDINATES)}.")
+        if not 0 < tightness <= 1:
+            raise ValueError(f"tightness must be in (0, 1], got {tightness}.")
+        self.seed = seed
+        self.customers = customers
+        self.coordinates_type = coordinates
+        self.clusters = clusters
+        self.tightness = tightness
+        self.vehicles = vehicles
+        self.max_demand = max_demand
+        self.grid = grid
+        self.dense = dense
+
+    def create_coordinates(self, rng):
+        depot = np.full((1, 2), self.grid / 2)
+        if self.coordinates_type == "euclidean":
+            points = rng.uniform(0, self.grid, size=(self.customers, 2))
+        else:
+            centers = rng.uniform(0, self.grid, size=(self.clusters, 2))
+            members = rng.integers(self.clusters, size=self.customers)
+            spread = self.grid / (4 * np.sqrt(self.clusters))
+            points = np.clip(centers[members] + rng.normal(0, spread, size=(self.customers, 2)), 0, self.grid)
+        return np.vstack([depot, points])
+
+    def create_demands(self, rng):
+        demand = rng.integers(1, self.max_demand + 1, size=self.customers)
+        ratio = rng.uniform(0, 1, size=self.customers)
+        delivery = np.rint(ratio * demand).astype(np.int64)
+        pickup = demand - delivery
+        return np.concatenate([[0], pickup]), np.concatenate([[0], delivery])
+
+    def create(self):
+        rng = np.random.default_rng(self.seed)
+        self.COORDINATES = self.create_coordinates(rng)
+        self.PICKUP, self.DELIVERY = self.create_demands(rng)
+        total = max(self.PICKUP.sum(), self.DELIVERY.sum())
+        largest = max(self.PICKUP.max(), self.DELIVERY.max())
+        self.CAPACITY = int(max(np.ceil(total / (self.vehicles * self.tightness)), largest))
+        if self.dense:
+            self.COST = euclidean_matrix(self.COORDINATES)
+        else:
+            self.COST = EuclideanCost(self.COORDINATES)
+        return self
@@ -0,0 +1,77 @@
+import os
+import json
+import numpy as np
+
+from . import symbolic
+
+
+FORMAT = "vrpspd-instance"
+VERSION = 1
+HEADER = "instance.json"
+ARRAYS = ("cost", "pickup", "delivery")
+
+
+def is_instance(path):
+    """Whether path is an instance directory or its header file
+    """
+    if os.path.isdir(path):
+        return os.path.isfile(os.path.join(path, HEADER))
+    return os.path.basename(path) == HEADER and os.path.isfile(path)
+
+
+def save_instance(directory, cost, pickup, delivery, capacity, name=None, **metadata):
+    """Write an instance as a JSON header plus one .npy file per array
+
+    Extra keyword arguments (e.g. coordinates source, seed) are stored in the
+    header as metadata.
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = {"cost": np.asarray(cost), "pickup": np.asarray(pickup), "delivery": np.asarray(delivery)}
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "name": name or os.path.basename(os.path.normpath(directory)),
+        "nodes": int(len(arrays["cost"])),
+        "capacity": capacity.item() if isinstance(capacity, np.generic) else capacity,
+        "arrays": {},
+        "metadata": metadata,
+    }
+    for key, array in arrays.items():
+        filename = f"{key}.npy"
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(array))
+        header["arrays"][key] = {"file": filename, "dtype": array.dtype.str, "shape": list(array.shape)}
+    with open(os.path.join(directory, HEADER), "w") as f:
+        json.dump(header, f, indent=2)
+    return directory
+
+
+class StoredInstance(symbolic.SymbolicInstance):
+    """Instance read from the binary format
+
+    The arrays are memory-mapped read-only, so pages are only read when
+    touched and processes opening the same instance share them through the
+    page cache. G, OBJ_FUNC and CONSTRAINTS are only built when accessed.
+    """
+    def __init__(self, path, mmap=True):
+        directory = path if os.path.isdir(path) else os.path.dirname(path)
+        with open(os.path.join(directory, HEADER)) as f:
+            header = json.load(f)
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a {FORMAT} instance.")
+        if header.get("version", 0) > VERSION:
+            raise ValueError(f"Instance format version {header['version']} is newer than the supported version {VERSION}.")
+        self.directory = directory
+        self.header = header
+        self.name = header["name"]
+        mmap_mode = "r" if mmap else None
+        arrays = {key: np.load(os.path.join(directory, header["arrays"][key]["file"]), mmap_mode=mmap_mode) for key in ARRAYS}
+        self.COST = arrays["cost"]
+        # pickup and delivery are O(N), keep them in memory
+        self.PICKUP = np.array(arrays["pickup"])
+        self.DELIVERY = np.array(arrays["delivery"])
+        self.CAPACITY = header["capacity"]
+
+
+def load_instance(path, mmap=True):
+    return StoredInstance(path, mmap=mmap)
+
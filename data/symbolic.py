@@ -0,0 +1,68 @@
+import numpy as np
+import networkx as nx
+
+
+def build_graph(COST, PICKUP, DELIVERY):
+    """Directed graph of the cost matrix with the pickup and delivery of every node
+    """
+    G = nx.from_numpy_array(COST, create_using=nx.DiGraph)
+    for node, (pickup_val, delivery_val) in enumerate(zip(PICKUP, DELIVERY)):
+        G.nodes[node]["pickup"] = pickup_val
+        G.nodes[node]["delivery"] = delivery_val
+    return G
+
+
+def build_objective_function(nodes):
+    return " + ".join([f"X[{i}][{j}]*C[{i}][{j}]" for i in nodes for j in nodes])
+
+
+def build_constraints(nodes):
+    """Constraint strings (6.09 - 6.16) of the single vehicle model, as in data/instance_one.py
+    """
+    nodes = list(nodes)
+    V_C = [node for node in nodes if node != 0]
+    constraints_6_09 = [" + ".join([f"X[{i}][{j}]" for j in nodes]) + " == 1" for i in V_C]
+    constraints_6_10 = [" + ".join([f"X[{i}][{j}]" for j in nodes]) + " - " + " - ".join([f"X[{j}][{i}]" for j in nodes]) + " == 0" for i in nodes]
+    constraints_6_11 = [" + ".join([f"X[{0}][{i}]" for i in nodes]) + " <= 1"]
+    constraints_6_12 = [f"Y[{i}][{j}] + Z[{i}][{j}] <= Q * X[{i}][{j}]" for i in nodes for j in nodes]
+    constraints_6_13 = [" + ".join([f"Y[{i}][{j}]" for j in nodes]) + " - " + " - ".join([f"Y[{j}][{i}]" for j in nodes]) + f" == P[{i}]" for i in V_C]
+    constraints_6_14 = [" + ".join([f"Z[{j}][{i}]" for j in nodes]) + " - " + " - ".join([f"Z[{i}][{j}]" for j in nodes]) + f" == D[{i}]" for i in V_C]
+    constraints_6_15_Y = [f"Y[{i}][{j}]" + " >= 0" for i in nodes for j in nodes]
+    constraints_6_15_Z = [f"Z[{i}][{j}]" + " >= 0" for i in nodes for j in nodes]
+    constraints_6_16 = [f"X[{i}][{j}]" + " in {0, 1}" for i in nodes for j in nodes]
+
+    return constraints_6_09 +\
+           constraints_6_10 +\
+           constraints_6_11 +\
+           constraints_6_12 +\
+           constraints_6_13 +\
+           constraints_6_14 +\
+           constraints_6_15_Y +\
+           constraints_6_15_Z +\
+           constraints_6_16
+
+
+class SymbolicInstance(object):
+    """Builds G, OBJ_FUNC and CONSTRAINTS of an instance from COST, PICKUP and DELIVERY on first access
+    """
+    _G = None
+    _OBJ_FUNC = None
+    _CONSTRAINTS = None
+
+    @property
+    def G(self):
+        if self._G is None:
+            self._G = build_graph(np.asarray(self.COST), self.PICKUP, self.DELIVERY)
+        return self._G
+
+    @property
+    def OBJ_FUNC(self):
+        if self._OBJ_FUNC is None:
+            self._OBJ_FUNC = build_objective_function(range(len(self.COST)))
+        return self._OBJ_FUNC
+
+    @property
+    def CONSTRAINTS(self):
+        if self._CONSTRAINTS is None:
+            self._CONSTRAINTS = build_constraints(range(len(self.COST)))
+        return self._CONSTRAINTS
@@ -0,0 +1,118 @@
+import numpy as np
+from itertools import islice, permutations
+
+import batch
+
+
+def subset_sums(values):
+    """sums[mask] = sum of values[b] over the bits b set in mask
+    """
+    sums = np.zeros(1, dtype=float)
+    for value in values:
+        sums = np.concatenate([sums, sums + value])
+    return sums
+
+
+def held_karp(cost, pickup, delivery, capacity, chunk_size=8192, max_customers=22):
+    """Optimal single route by bitmask dynamic programming (Held-Karp)
+
+    dp[S][j] is the cost of the cheapest path leaving the depot, visiting the
+    customers of S and ending at j. With simultaneous pickup and delivery the
+    load after visiting S is D_total + sum(P - D over S), which does not
+    depend on the order of S, so every set whose load exceeds the capacity is
+    pruned with all of its extensions. Sets are processed layer by layer (by
+    size) in chunks, so no list of paths or states is ever materialized.
+    Returns
+    ----------
+    (list, float)
+    the optimal route [0, ..., 0] and its cost, or (None, inf) when no route
+    keeps the load within capacity
+    """
+    n = len(cost)
+    m = n - 1
+    if m > max_customers:
+        raise ValueError(f"Exact search over {m} customers needs 2^{m} * {m} states, above max_customers={max_customers}.")
+    if m == 0:
+        return [0, 0], float(cost[0, 0])
+    cost = np.asarray(cost, dtype=float)
+    customers = np.arange(1, n)
+    start_load = float(delivery[customers].sum())
+    if start_load > capacity:
+        return None, np.inf
+
+    size = 1 << m
+    feasible = start_load + subset_sums(pickup[customers] - delivery[customers]) <= capacity
+    popcount = subset_sums(np.ones(m)).astype(np.int64)
+    bits = 1 << np.arange(m)
+    customer_cost = cost[1:, 1:]
+
+    dp = np.full((size, m), np.inf)
+    parent = np.full((size, m), -1, dtype=np.int8 if m < 127 else np.int16)
+    singles = bits[feasible[bits]]
+    dp[singles, np.log2(singles).astype(np.int64)] = cost[0, customers][feasible[bits]]
+
+    for k in range(1, m):
+        layer = np.flatnonzero((popcount == k) & feasible)
+        for start in range(0, len(layer), chunk_size):
+            masks = layer[start:start + chunk_size]
+            # best predecessor i for every next customer j: min_i dp[S][i] + C[i][j]
+            candidates = dp[masks][:, :, None] + customer_cost[None, :, :]
+            best_i = np.argmin(candidates, axis=1)
+            best = np.take_along_axis(candidates, best_i[:, None, :], axis=1)[:, 0, :]
+            extended = masks[:, None] | bits[None, :]
+            valid = ((masks[:, None] & bits[None, :]) == 0) & feasible[extended] & np.isfinite(best)
+            rows, js = np.nonzero(valid)
+            dp[extended[rows, js], js] = best[rows, js]
+            parent[extended[rows, js], js] = best_i[rows, js]
+
+    full = size - 1
+    totals = dp[full] + cost[customers, 0]
+    last = int(np.argmin(totals))
+    if not np.isfinite(totals[last]):
+        return None, np.inf
+
+    route = []
+    mask = full
+    while last >= 0:
+        route.append(last + 1)
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous
+    return [0] + route[::-1] + [0], float(totals.min())
+
+
+def brute_force(cost, pickup, delivery, capacity, chunk_size=8192, max_customers=10):
+    """Optimal single route by enumerating every order of the customers
+
+    Meant to validate the other solvers on small instances: permutations
+    are scored chunk_size at a time with batch.evaluate_routes.
+    Returns
+    ----------
+    (list, float)
+    the optimal route [0, ..., 0] and its cost, or (None, inf) when no route
+    keeps the load within capacity
+    """
+    n = len(cost)
+    if n - 1 > max_customers:
+        raise ValueError(f"Brute force over {n - 1} customers checks {n - 1}! routes, above max_customers={max_customers}.")
+    orders = permutations(range(1, n))
+    best_path, best_value = None, np.inf
+    while True:
+        chunk = np.array(list(islice(orders, chunk_size)), dtype=np.int64).reshape(-1, n - 1)
+        if not len(chunk):
+            break
+        routes = np.pad(chunk, ((0, 0), (1, 1)))
+        costs, feasible = batch.evaluate_routes(cost, routes, pickup, delivery, capacity)
+        costs = np.where(feasible, costs, np.inf)
+        idx = int(np.argmin(costs))
+        if costs[idx] < best_value:
+            best_path, best_value = routes[idx].tolist(), float(costs[idx])
+    return best_path, best_value
+
+
+def optimality_gap(value, optimal_value):
+    """Relative gap of a solution value to the optimal value
+    """
+    if optimal_value == 0:
+        return 0.0 if value == 0 else np.inf
+    return (value - optimal_value) / abs(optimal_value)
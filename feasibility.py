@@ -0,0 +1,173 @@
+import numpy as np
+
+
+def check_route(path, vertices_num, pickup, delivery, capacity):
+    """Check a single route without the LP constraint strings
+    
+    A route [0, ..., 0] visiting every customer exactly once satisfies the
+    degree, flow conservation and load flow constraints by construction, so
+    only its structure and the vehicle load along it are checked.
+    Returns
+    ----------
+    (bool, list)
+    same format as CompiledConstraints.check
+    """
+    path = np.asarray(path)
+    violations = []
+    if len(path) < 2 or path[0] != 0 or path[-1] != 0:
+        violations.append({"index": None, "family": "route", "constraint": "route starts and ends at the depot", "lhs": None, "rhs": None})
+    visits = np.bincount(path[1:-1], minlength=vertices_num)[:vertices_num] if len(path) > 2 else np.zeros(vertices_num, dtype=np.int64)
+    for node in np.flatnonzero(visits[1:] != 1) + 1:
+        violations.append({"index": None, "family": "route", "constraint": f"customer {node} is visited once", "lhs": float(visits[node]), "rhs": 1.0})
+    if violations:
+        return False, violations
+    max_load = LoadProfile(path, pickup, delivery, capacity).max_load
+    if max_load > capacity:
+        violations.append({"index": None, "family": "capacity", "constraint": "Y + Z <= Q on every arc", "lhs": float(max_load), "rhs": float(capacity)})
+    return not violations, violations
+
+
+class SparseTable(object):
+    """Range max (or min) queries in O(1) after an O(N log N) build
+    """
+    def __init__(self, values, op=np.maximum):
+        values = np.asarray(values, dtype=float)
+        self.op = op
+        self.empty = -np.inf if op is np.maximum else np.inf
+        self.table = [values]
+        width = 1
+        while 2 * width <= len(values):
+            previous = self.table[-1]
+            self.table.append(op(previous[:-width], previous[width:]))
+            width *= 2
+
+    def query(self, lo, hi):
+        """Reduce values[lo..hi] (inclusive). Empty ranges return -inf for max and inf for min.
+        """
+        if hi < lo:
+            return self.empty
+        level = int(hi - lo + 1).bit_length() - 1
+        row = self.table[level]
+        return self.op(row[lo], row[hi - (1 << level) + 1])
+
+
+class LoadProfile(object):
+    """Vehicle load along a route with simultaneous pickup and delivery
+
+    ``loads[k]`` is the load on the arc leaving ``path[k]``: every pickup made
+    so far plus every delivery still on board, which is what ``Y + Z`` holds
+    on that arc in the LP. Prefix/suffix maxima and sparse tables over the
+    loads decide whether a move keeps the load within capacity in O(1),
+    without rebuilding the Y and Z matrices.
+    """
+    def __init__(self, path, pickup, delivery, capacity):
+        path = np.asarray(path)
+        self.path = path
+        self.pickup = pickup
+        self.delivery = delivery
+        self.capacity = capacity
+        nodes = path[:-1]
+        self.balance = pickup[nodes] - delivery[nodes]
+        self.delivery_total = delivery[nodes].sum()
+        # delivered[k] is what has been dropped off at path[0..k]
+        self.delivered = np.cumsum(delivery[nodes])
+        self.loads = self.delivery_total + np.cumsum(self.balance)
+        self.prefix_max = np.maximum.accumulate(self.loads)
+        # suffix_max[k] covers loads[k:], with an extra -inf entry for empty suffixes
+        self.suffix_max = np.append(np.maximum.accumulate(self.loads[::-1])[::-1], -np.inf)
+        self.max_table = SparseTable(self.loads, np.maximum)
+        self.min_table = SparseTable(self.loads, np.minimum)
+
+    @property
+    def max_load(self):
+        return self.prefix_max[-1]
+
+    def is_feasible(self):
+        return self.max_load <= self.capacity
+
+    def _prefix(self, k):
+        return self.prefix_max[k] if k >= 0 else -np.inf
+
+    def _prefix_many(self, k):
+        k = np.asarray(k)
+        return np.where(k >= 0, self.prefix_max[np.maximum(k, 0)], -np.inf)
+
+    def swap_max_load(self, a, b):
+        """Max load after swapping the nodes at positions a and b
+        """
+        if a > b:
+            a, b = b, a
+        # only the arcs between the two positions change, all by the same amount
+        shift = self.balance[b] - self.balance[a]
+        return max(self._prefix(a - 1), self.suffix_max[b], self.max_table.query(a, b - 1) + shift)
+
+    def swap_feasible(self, a, b):
+        return self.swap_max_load(a, b) <= self.capacity
+
+    def segment_move_max_load(self, start, end, target):
+        """Max load after moving the segment path[start..end] right after position target
+        """
+        loads = self.loads
+        if target > end:
+            # the block path[end+1..target] moves in front of the segment
+            segment = loads[end] - loads[start - 1]
+            block = loads[target] - loads[end]
+            return max(self._prefix(start - 1), self.max_table.query(end + 1, target) - segment, self.max_table.query(start, end) + block, self.suffix_max[target + 1])
+        if target < start - 1:
+            # the block path[target+1..start-1] moves behind the segment
+            segment = loads[end] - loads[start - 1]
+            block = loads[start - 1] - loads[target]
+            return max(self._prefix(target), self.max_table.query(start, end) - block, self.max_table.query(target + 1, start - 1) + segment, self.suffix_max[end + 1])
+        return self.max_load
+
+    def segment_move_feasible(self, start, end, target):
+        return self.segment_move_max_load(start, end, target) <= self.capacity
+
+    def reversal_max_load(self, start, end):
+        """Max load after reversing the segment path[start..end] (2-opt)
+        """
+        if end <= start:
+            return self.max_load
+        # the arc leaving the m-th reversed node carries loads[start-1] plus the
+        # balance of path[end-m..end], the arcs around the segment keep their load
+        inside = self.loads[start - 1] + self.loads[end] - self.min_table.query(start, end - 1)
+        return max(self._prefix(start - 1), self.suffix_max[end], inside)
+
+    def reversal_feasible(self, start, end):
+        return self.reversal_max_load(start, end) <= self.capacity
+
+    # The queries below change which nodes are on the route, as inter-route
+    # moves do. They accept scalars or broadcastable arrays of positions/nodes.
+
+    def removal_max_load(self, p):
+        """Max load after removing the node at position p
+        """
+        p = np.asarray(p)
+        node = self.path[p]
+        # the delivery is no longer loaded at the depot, the pickup no longer collected
+        return np.maximum(self._prefix_many(p - 1) - self.delivery[node], self.suffix_max[p + 1] - self.pickup[node])
+
+    def insertion_max_load(self, t, node):
+        """Max load after inserting node right after position t
+        """
+        t = np.asarray(t)
+        return np.maximum(self.prefix_max[t] + self.delivery[node], self.suffix_max[t] + self.pickup[node])
+
+    def replacement_max_load(self, p, node):
+        """Max load after replacing the node at position p by node
+        """
+        p = np.asarray(p)
+        old = self.path[p]
+        return np.maximum(self._prefix_many(p - 1) + self.delivery[node] - self.delivery[old], self.suffix_max[p] + self.pickup[node] - self.pickup[old])
+
+    def tail_exchange_max_load(self, p, other, q):
+        """Max load of the route path[0..p] followed by the tail other.path[q+1..]
+        """
+        p = np.asarray(p)
+        q = np.asarray(q)
+        own_tail = self.delivery_total - self.delivered[p]
+        other_tail = other.delivery_total - other.delivered[q]
+        shift = other_tail - own_tail
+        head = self.prefix_max[p] + shift
+        tail = other.suffix_max[q + 1] + (self.loads[p] + shift) - other.loads[q]
+        return np.maximum(head, tail)
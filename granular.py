@@ -0,0 +1,47 @@
+import numpy as np
+
+
+def nearest_neighbors(cost, k, chunk_size=1024):
+    """The k customers closest to every node
+    Parameters
+    ----------
+    cost : np.ndarray
+    (N, N) cost matrix, or any object indexed like it (e.g. data.benchmark.EuclideanCost)
+    k : int
+    number of neighbors, at most N - 2
+    Returns
+    ----------
+    np.ndarray
+    (N, k) array whose row u holds the customers v != u with the smallest
+    C[u][v] + C[v][u], closest first. Rows are built by blocks of chunk_size
+    with argpartition, so the full matrix is never sorted nor copied.
+    """
+    n = len(cost)
+    k = min(k, n - 2)
+    neighbors = np.empty((n, k), dtype=np.int64)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        rows = np.arange(start, stop)
+        block = np.asarray(cost[start:stop, 1:], dtype=float) + np.asarray(cost[1:, start:stop], dtype=float).T
+        # a node is not its own neighbor, column c is customer c + 1
+        own = rows >= 1
+        block[np.flatnonzero(own), rows[own] - 1] = np.inf
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(block, nearest, axis=1), axis=1, kind="stable")
+        neighbors[start:stop] = np.take_along_axis(nearest, order, axis=1) + 1
+    return neighbors
+
+
+def candidate_pairs(neighbors):
+    """Customer pairs (i, j), i < j, where j is a neighbor of i or i a neighbor of j
+    Returns
+    ----------
+    (np.ndarray, np.ndarray)
+    nodes_i and nodes_j of the pairs, sorted by (i, j), at most k * (N - 1) pairs
+    """
+    n, k = neighbors.shape
+    i = np.repeat(np.arange(1, n), k)
+    j = neighbors[1:].ravel()
+    low, high = np.minimum(i, j), np.maximum(i, j)
+    keys = np.unique(low * n + high)
+    return (keys // n).astype(np.int32), (keys % n).astype(np.int32)
@@ -0,0 +1,68 @@
+import numpy as np
+
+from data.benchmark import EuclideanCost
+
+
+def apply_delta(cost, pickup, delivery, capacity, delta):
+    """Instance arrays after a small change, and how the nodes are renumbered
+    Parameters
+    ----------
+    delta : dict
+    the change, every key being optional, applied in this order:
+    - "update": {node: {"pickup": p, "delivery": d}} new quantities of customers
+    - "add": list of new customers {"pickup", "delivery"} with either
+      "coordinates" (for a cost computed from coordinates, see
+      data.benchmark.EuclideanCost) or "cost_to" and "cost_from", the costs
+      C[new][j] and C[j][new] to and from every node j once the customer
+      is added, the customers added before it included and itself last
+    - "remove": customers cancelled, the others are renumbered in order
+    - "capacity": new vehicle capacity
+    Returns
+    ----------
+    (cost, pickup, delivery, capacity, mapping, added)
+    the new instance arrays, the new number of every node of the
+    instance after the updates and additions (-1 when removed) and the new
+    numbers of the added customers
+    """
+    pickup = np.array(pickup, dtype=float)
+    delivery = np.array(delivery, dtype=float)
+    for node, quantities in delta.get("update", {}).items():
+        node = int(node)
+        if not 0 < node < len(pickup):
+            raise ValueError(f"Cannot update node {node}, customers are 1..{len(pickup) - 1}.")
+        pickup[node] = quantities.get("pickup", pickup[node])
+        delivery[node] = quantities.get("delivery", delivery[node])
+
+    added = []
+    for customer in delta.get("add", []):
+        n = len(pickup)
+        if isinstance(cost, EuclideanCost):
+            cost = EuclideanCost(np.vstack((cost.coordinates, customer["coordinates"])), precision=cost.precision)
+        else:
+            cost_to = np.asarray(customer["cost_to"], dtype=float)
+            cost_from = np.asarray(customer["cost_from"], dtype=float)
+            if len(cost_to) != n + 1 or len(cost_from) != n + 1:
+                raise ValueError(f"Customer {n} needs cost_to and cost_from over the {n + 1} nodes, itself last.")
+            extended = np.empty((n + 1, n + 1))
+            extended[:n, :n] = cost
+            extended[n, :] = cost_to
+            extended[:, n] = cost_from
+            cost = extended
+        pickup = np.append(pickup, float(customer["pickup"]))
+        delivery = np.append(delivery, float(customer["delivery"]))
+        added.append(n)
+
+    removed = sorted({int(node) for node in delta.get("remove", [])})
+    if any(not 0 < node < len(pickup) for node in removed):
+        raise ValueError(f"Cannot remove {removed}, customers are 1..{len(pickup) - 1}.")
+    keep = np.setdiff1d(np.arange(len(pickup)), removed)
+    mapping = np.full(len(pickup), -1, dtype=np.int64)
+    mapping[keep] = np.arange(len(keep))
+    if removed:
+        if isinstance(cost, EuclideanCost):
+            cost = EuclideanCost(cost.coordinates[keep], precision=cost.precision)
+        else:
+            cost = np.asarray(cost)[np.ix_(keep, keep)]
+        pickup = pickup[keep]
+        delivery = delivery[keep]
+    return cost, pickup, delivery, delta.get("capacity", capacity), mapping, [int(mapping[node]) for node in added if mapping[node] >= 0]
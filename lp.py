@@ -1,14 +1,104 @@
+import numpy as np
+
 import data
+import granular
+from data import symbolic
+from constraint_compiler import compile_constraints
 
 class LP(object):
-    def __init__(self, graph, cost, objective_function, constraints, pickup, delivery, capacity):
-        self.graph = graph
+    """Routing problem on the cost, pickup and delivery arrays
+
+    The networkx graph, the objective function string and the constraint
+    strings are only built from the arrays when they are accessed (e.g.
+    printing or the reference evaluation), so they can be left as None for
+    large instances. The constraints are compiled on first use when their
+    strings are given or have been built.
+    """
+    def __init__(self, graph, cost, objective_function, constraints, pickup, delivery, capacity, compiled_constraints=None, candidates=None):
+        self._graph = graph
+        self.cost = cost
+        self._objective_function = objective_function
+        self._constraints = constraints
+        self.pickup = pickup
+        self.delivery = delivery
+        self.capacity = capacity
+        self._compiled_constraints = compiled_constraints
+        # nearest neighbor lists by k, shared by every solver built from the problem
+        self.candidates = candidates if candidates is not None else {}
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = symbolic.build_graph(np.asarray(self.cost), self.pickup, self.delivery)
+        return self._graph
+
+    @property
+    def objective_function(self):
+        if self._objective_function is None:
+            self._objective_function = symbolic.build_objective_function(range(len(self.cost)))
+        return self._objective_function
+
+    @property
+    def constraints(self):
+        if self._constraints is None:
+            self._constraints = symbolic.build_constraints(range(len(self.cost)))
+        return self._constraints
+
+    @property
+    def compiled_constraints(self):
+        """Compiled constraint strings, None while the strings are neither given nor built
+        """
+        if self._compiled_constraints is None and self._constraints is not None:
+            self._compiled_constraints = compile_constraints(self._constraints, len(self.cost), cost=self.cost, pickup=self.pickup, delivery=self.delivery, capacity=self.capacity)
+        return self._compiled_constraints
+
+    def set_instance(self, cost, pickup, delivery, capacity):
+        """Replace the instance arrays and drop the structures derived from them
+
+        The graph is rebuilt on access, the objective function and constraint
+        strings too when the number of nodes changed, and the constraints are
+        compiled again on first use. The nearest neighbor lists are only
+        dropped when the cost changed. Other problems sharing the previous
+        structures keep them.
+        """
+        resized = len(cost) != len(self.cost)
+        if cost is not self.cost:
+            self.candidates = {}
         self.cost = cost
-        self.objective_function = objective_function
-        self.constraints = constraints
         self.pickup = pickup
         self.delivery = delivery
         self.capacity = capacity
+        self._graph = None
+        if resized:
+            self._objective_function = None
+            if self._constraints is not None:
+                self._constraints = symbolic.build_constraints(range(len(cost)))
+        self._compiled_constraints = None
+
+    def get_candidates(self, k):
+        """Nearest neighbor lists of the k closest customers of every node, see granular.nearest_neighbors
+        """
+        if k not in self.candidates:
+            self.candidates[k] = granular.nearest_neighbors(self.cost, k)
+        return self.candidates[k]
+
+    def get_problem(self):
+        """Arguments of LP.__init__ describing this problem, for the solvers built from it
+
+        The symbolic parts are passed as they are (None when not built yet) and
+        the compiled constraints are shared, so they are compiled once per problem.
+        """
+        return {
+            "graph": self._graph,
+            "cost": self.cost,
+            "objective_function": self._objective_function,
+            "constraints": self._constraints,
+            "pickup": self.pickup,
+            "delivery": self.delivery,
+            "capacity": self.capacity,
+            "compiled_constraints": self.compiled_constraints,
+            "candidates": self.candidates,
+        }
         
     def __str__(self):
         constraints_string = "\n".join(["{0}   (Eq. {1})".format(f"{const: >150}", f"{idx+1}".zfill(3)) for idx, const in enumerate(self.constraints)])
@@ -0,0 +1,208 @@
+import numpy as np
+
+
+# intra-route move kinds. A move is a node pair (i, j) of one kind:
+# - swap: exchange nodes i and j
+# - 2-opt: reverse the path between i and j so that the earlier one is
+#   followed by the later one, i may be the depot to reverse from the start
+# - relocate, or-opt-2, or-opt-3: move the segment of 1, 2 or 3 nodes
+#   starting at i right after node j, j may be the depot to move it first
+SWAP, TWO_OPT, RELOCATE, OR_OPT_2, OR_OPT_3 = 0, 1, 2, 3, 4
+MOVE_NAMES = {SWAP: "swap", TWO_OPT: "2-opt", RELOCATE: "relocate", OR_OPT_2: "or-opt-2", OR_OPT_3: "or-opt-3"}
+# operator name -> move kinds, or-opt moves segments of 2 and 3 nodes
+OPERATORS = {
+    "swap": (SWAP,),
+    "2-opt": (TWO_OPT,),
+    "relocate": (RELOCATE,),
+    "or-opt": (OR_OPT_2, OR_OPT_3),
+}
+SEGMENT_LENGTH = {RELOCATE: 1, OR_OPT_2: 2, OR_OPT_3: 3}
+
+
+def get_kinds(operators):
+    """Move kinds of the given operator names, in the order of moves.OPERATORS
+    """
+    for operator in operators:
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator: {operator}. Use one of {', '.join(OPERATORS)}.")
+    kinds = tuple(kind for operator, kinds in OPERATORS.items() if operator in operators for kind in kinds)
+    if not kinds:
+        raise ValueError(f"No operator given. Use some of {', '.join(OPERATORS)}.")
+    return kinds
+
+
+def position_index(path, vertices_num=None):
+    """Map every node to its position in the path
+
+    The depot keeps the position of its first occurrence (0). Nodes that are
+    not on the path are mapped to -1.
+    """
+    path = np.asarray(path)
+    if vertices_num is None:
+        vertices_num = int(path.max()) + 1
+    position = np.full(vertices_num, -1, dtype=np.int64)
+    # reversed so that the first occurrence of a repeated node wins
+    position[path[::-1]] = np.arange(len(path) - 1, -1, -1)
+    return position
+
+
+def swap_nodes(path, position, node_i, node_j):
+    """Returns copies of the path and its position index with node_i and node_j swapped
+    """
+    path = list(path)
+    position = position.copy()
+    i_index, j_index = position[node_i], position[node_j]
+    path[i_index], path[j_index] = path[j_index], path[i_index]
+    position[node_i], position[node_j] = j_index, i_index
+    return path, position
+
+
+def swap_delta(cost, path, position, node_i, node_j):
+    """Cost change of swapping node_i and node_j, computed from the affected edges
+    """
+    a, b = position[node_i], position[node_j]
+    if a > b:
+        a, b = b, a
+    before, first, second, after = path[a - 1], path[a], path[b], path[b + 1]
+    if b == a + 1:
+        # adjacent nodes share the middle edge, which is only reversed
+        removed = cost[before, first] + cost[first, second] + cost[second, after]
+        added = cost[before, second] + cost[second, first] + cost[first, after]
+    else:
+        removed = cost[before, first] + cost[first, path[a + 1]] + cost[path[b - 1], second] + cost[second, after]
+        added = cost[before, second] + cost[second, path[a + 1]] + cost[path[b - 1], first] + cost[first, after]
+    return added - removed
+
+
+def swap_deltas(cost, path, position, nodes_i, nodes_j):
+    """Vectorized swap_delta over arrays of node pairs
+    """
+    path = np.asarray(path)
+    a = position[np.asarray(nodes_i)]
+    b = position[np.asarray(nodes_j)]
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    before, first, second, after = path[a - 1], path[a], path[b], path[b + 1]
+    first_next, second_prev = path[a + 1], path[b - 1]
+    adjacent = b == a + 1
+
+    removed = cost[before, first] + cost[second, after]
+    added = cost[before, second] + cost[first, after]
+    removed = removed + np.where(adjacent, cost[first, second], cost[first, first_next] + cost[second_prev, second])
+    added = added + np.where(adjacent, cost[second, first], cost[second, first_next] + cost[second_prev, first])
+    return added - removed
+
+
+def two_opt(path, position, node_i, node_j):
+    """Returns copies of the path and its position index with the nodes after the earlier of node_i, node_j reversed up to the later one
+    """
+    a, b = sorted((position[node_i], position[node_j]))
+    path = list(path)
+    path[a + 1:b + 1] = path[a + 1:b + 1][::-1]
+    position = position.copy()
+    position[path[a + 1:b + 1]] = np.arange(a + 1, b + 1)
+    return path, position
+
+
+def two_opt_deltas(cost, path, position, nodes_i, nodes_j):
+    """Cost change of every 2-opt move, inf for the moves that change nothing
+
+    Reversing path[a+1..b] replaces the arcs (path[a], path[a+1]) and
+    (path[b], path[b+1]) and reverses every arc in between, which prefix sums
+    of the forward and backward arc costs give in O(1) for asymmetric costs.
+    """
+    path = np.asarray(path)
+    a = position[np.asarray(nodes_i)]
+    b = position[np.asarray(nodes_j)]
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    # forward[k] (backward[k]) sums the cost of the arcs 0..k-1 (reversed)
+    forward = np.concatenate(([0.0], np.cumsum(cost[path[:-1], path[1:]])))
+    backward = np.concatenate(([0.0], np.cumsum(cost[path[1:], path[:-1]])))
+    reversed_inside = (backward[b] - backward[a + 1]) - (forward[b] - forward[a + 1])
+    removed = cost[path[a], path[a + 1]] + cost[path[b], path[b + 1]]
+    added = cost[path[a], path[b]] + cost[path[a + 1], path[b + 1]]
+    return np.where(b > a + 1, added - removed + reversed_inside, np.inf)
+
+
+def move_segment(path, position, node_i, node_j, length):
+    """Returns copies of the path and its position index with the segment of length nodes starting at node_i moved right after node_j
+
+    The segment stops at the last customer, and the path is left unchanged
+    when node_j is in the segment or right before it.
+    """
+    start, target = position[node_i], position[node_j]
+    end = min(start + length, len(path) - 1) - 1
+    path = list(path)
+    position = position.copy()
+    if start - 1 <= target <= end:
+        return path, position
+    segment = path[start:end + 1]
+    if target > end:
+        path[start:target + 1] = path[end + 1:target + 1] + segment
+        lo, hi = start, target
+    else:
+        path[target + 1:end + 1] = segment + path[target + 1:start]
+        lo, hi = target + 1, end
+    position[path[lo:hi + 1]] = np.arange(lo, hi + 1)
+    return path, position
+
+
+def segment_deltas(cost, path, position, nodes_i, nodes_j, length):
+    """Cost change of moving the segment of length nodes starting at every node_i right after node_j
+
+    Moves whose segment runs into the final depot or contains node_j, and
+    moves that change nothing, are inf.
+    """
+    path = np.asarray(path)
+    last = len(path) - 2
+    start = position[np.asarray(nodes_i)]
+    target = position[np.asarray(nodes_j)]
+    end = start + length - 1
+    valid = (end <= last) & ((target < start - 1) | (target > end))
+    end = np.minimum(end, last)
+    first, final = path[start], path[end]
+    before, after = path[start - 1], path[end + 1]
+    removed = cost[before, first] + cost[final, after] - cost[before, after]
+    inserted = cost[path[target], first] + cost[final, path[target + 1]] - cost[path[target], path[target + 1]]
+    return np.where(valid, inserted - removed, np.inf)
+
+
+def apply_move(path, position, kind, node_i, node_j):
+    """Returns copies of the path and its position index with the move (node_i, node_j) of the given kind applied
+    """
+    if kind == SWAP:
+        return swap_nodes(path, position, node_i, node_j)
+    if kind == TWO_OPT:
+        return two_opt(path, position, node_i, node_j)
+    return move_segment(path, position, node_i, node_j, SEGMENT_LENGTH[kind])
+
+
+def move_deltas(cost, path, position, kinds, nodes_i, nodes_j):
+    """Cost change of every move given as arrays of kinds and node pairs
+    """
+    kinds = np.asarray(kinds)
+    nodes_i = np.asarray(nodes_i)
+    nodes_j = np.asarray(nodes_j)
+    deltas = np.empty(len(kinds))
+    for kind in np.unique(kinds):
+        mask = kinds == kind
+        if kind == SWAP:
+            deltas[mask] = swap_deltas(cost, path, position, nodes_i[mask], nodes_j[mask])
+        elif kind == TWO_OPT:
+            deltas[mask] = two_opt_deltas(cost, path, position, nodes_i[mask], nodes_j[mask])
+        else:
+            deltas[mask] = segment_deltas(cost, path, position, nodes_i[mask], nodes_j[mask], SEGMENT_LENGTH[int(kind)])
+    return deltas
+
+
+def changed_positions(path, position, kind, node_i, node_j):
+    """Positions of path that the move (node_i, node_j) of the given kind may change
+    """
+    a, b = position[node_i], position[node_j]
+    if kind == SWAP:
+        return np.array([a, b])
+    if kind == TWO_OPT:
+        return np.arange(min(a, b) + 1, max(a, b) + 1)
+    end = min(a + SEGMENT_LENGTH[kind], len(path) - 1) - 1
+    if a - 1 <= b <= end:
+        return np.arange(0)
+    return np.arange(a, b + 1) if b > end else np.arange(b + 1, end + 1)
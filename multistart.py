@@ -0,0 +1,145 @@
+import os
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import lp
+import construction
+from ts import Tabu_Search
+
+
+def random_initial_solution(problem, seed, repair=True):
+    """Random route [0, ..., 0] over the customers of the problem
+
+    With repair, a route that overloads the vehicle is built again by
+    inserting the customers in the same random order, each at its cheapest
+    load-feasible position (construction.repair_route), so that the starts
+    of a tight instance stay distinct.
+    """
+    rng = np.random.default_rng(seed)
+    customers = rng.permutation(np.arange(1, len(problem.cost)))
+    route = [0] + customers.tolist() + [0]
+    if repair and construction.route_max_load(route, problem.pickup, problem.delivery) > problem.capacity:
+        route = construction.repair_route([0, 0], customers, problem.cost, problem.pickup, problem.delivery, problem.capacity)
+    return route
+
+
+def get_start_configs(problem, starts, seed=0, tabu_tenures=(3, 5, 7, 10), penalty_values=(5, 50, 500, 5000), N_iter=10, time_limit=None):
+    """One configuration per start, each with its own seed, initial solution, tenure and penalty
+
+    The first start builds its initial route with the construction heuristic
+    of Tabu_Search, the others start from random routes, repaired when they
+    overload the vehicle (see random_initial_solution). config["initial"]
+    tells which: "construction", "random", "repaired", or "collapsed" for
+    a random start that could not be made feasible and falls back to the
+    construction heuristic like the first one.
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    for start in range(starts):
+        start_seed = int(rng.integers(2**31))
+        if start == 0:
+            initial_solution, initial = None, "construction"
+        else:
+            initial_solution = random_initial_solution(problem, start_seed, repair=False)
+            initial = "random"
+            if construction.route_max_load(initial_solution, problem.pickup, problem.delivery) > problem.capacity:
+                initial_solution = random_initial_solution(problem, start_seed)
+                initial = "repaired"
+                if construction.route_max_load(initial_solution, problem.pickup, problem.delivery) > problem.capacity:
+                    initial_solution, initial = None, "collapsed"
+        configs.append({
+            "start": start,
+            "seed": start_seed,
+            "initial_solution": initial_solution,
+            "initial": initial,
+            "tabu_tenure": int(tabu_tenures[start % len(tabu_tenures)]),
+            "penalty_value": float(penalty_values[(start // len(tabu_tenures)) % len(penalty_values)]),
+            "N_iter": N_iter,
+            "time_limit": time_limit,
+        })
+    return configs
+
+
+def run_start(problem, config):
+    """Run one tabu search with the given configuration and return its stats
+    """
+    start_time = time.perf_counter()
+    ts = Tabu_Search(
+        problem,
+        N_iter=config["N_iter"],
+        tabu_tenure=config["tabu_tenure"],
+        penalty_value=config["penalty_value"],
+        initial_solution=config["initial_solution"],
+        time_limit=config["time_limit"],
+        # the per-iteration output of every start would interleave, drop it
+        verbosity="quiet",
+    )
+    ts.run()
+    stats = {key: value for key, value in config.items() if key != "initial_solution"}
+    stats.update({
+        "best_path": [int(node) for node in ts.get_best_solution()],
+        "best_value": float(ts.best_value),
+        "feasible": bool(ts.check_constraints(ts.get_best_solution())),
+        "iterations": int(ts.iterations),
+        "runtime": time.perf_counter() - start_time,
+    })
+    return stats
+
+
+def multi_start(problem, starts=8, workers=None, seed=0, tabu_tenures=(3, 5, 7, 10), penalty_values=(5, 50, 500, 5000), N_iter=10, time_limit=None):
+    """Run independent tabu searches in parallel and keep the best feasible result
+    Parameters
+    ----------
+    problem : lp.LP
+    starts : int
+    number of independent searches
+    workers : int
+    number of processes, defaults to the number of CPUs
+    time_limit : float
+    wall-clock budget in seconds of every start
+    Returns
+    ----------
+    (dict, list)
+    stats of the best start and the stats of every start, in start order,
+    with how its initial route was built (see get_start_configs)
+    """
+    configs = get_start_configs(problem, starts, seed=seed, tabu_tenures=tabu_tenures, penalty_values=penalty_values, N_iter=N_iter, time_limit=time_limit)
+    workers = workers or os.cpu_count()
+    if workers <= 1:
+        runs = [run_start(problem, config) for config in configs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, starts)) as executor:
+            futures = [executor.submit(run_start, problem, config) for config in configs]
+            runs = [future.result() for future in futures]
+
+    # ties go to the earliest start so the result does not depend on scheduling
+    best = min(runs, key=lambda run: (not run["feasible"], run["best_value"], run["start"]))
+    return best, runs
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--starts', type=int, default=8, help='Number of independent tabu searches.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes, defaults to the number of CPUs.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the start configurations.')
+    parser.add_argument('--N_iter', type=int, default=10, help='Non-improving iterations before a start terminates.')
+    parser.add_argument('--time_limit', type=float, default=None, help='Wall-clock budget in seconds of every start.')
+    args = parser.parse_args()
+
+    problem = lp.construct_problem()
+    best, runs = multi_start(problem, starts=args.starts, workers=args.workers, seed=args.seed, N_iter=args.N_iter, time_limit=args.time_limit)
+
+    print(f"{'start': >5} {'initial': >12} {'tenure': >6} {'penalty': >9} {'iterations': >10} {'runtime': >8} {'feasible': >8} {'best_value': >12}  best_path")
+    for run in runs:
+        print(f"{run['start']: >5} {run['initial']: >12} {run['tabu_tenure']: >6} {run['penalty_value']: >9} {run['iterations']: >10} {run['runtime']: >8.3f} {str(run['feasible']): >8} {run['best_value']: >12}  {run['best_path']}")
+    collapsed = sum(run["initial"] == "collapsed" for run in runs)
+    if collapsed:
+        print(f"{collapsed} random start(s) could not be made feasible and started from the construction heuristic")
+    print()
+    print("Best solution (multi-start tabu search)")
+    print("Start:", best["start"])
+    print("Path:", best["best_path"])
+    print("Value:", best["best_value"])
@@ -0,0 +1,88 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import moves
+
+
+# arrays attached by every worker process, see _attach
+_shared = {}
+
+
+class SharedArrays(object):
+    """Copies numpy arrays once into shared memory blocks that worker processes attach to
+
+    Memory-mapped arrays (see data.storage) are not copied, the workers map
+    the same file and share its pages through the page cache.
+    """
+    def __init__(self, **arrays):
+        self.blocks = {}
+        self.specs = {}
+        for name, array in arrays.items():
+            if isinstance(array, np.memmap) and array.filename is not None and array.flags.c_contiguous:
+                self.specs[name] = ("file", array.filename, array.offset, array.shape, array.dtype.str)
+                continue
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks[name] = block
+            self.specs[name] = ("shm", block.name, 0, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+
+def _attach(specs):
+    for name, (kind, source, offset, shape, dtype) in specs.items():
+        if kind == "file":
+            _shared[name] = (None, np.memmap(source, dtype=np.dtype(dtype), mode="r", offset=offset, shape=shape))
+        else:
+            block = shared_memory.SharedMemory(name=source)
+            _shared[name] = (block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf))
+
+
+def _get(name):
+    return _shared[name][1]
+
+
+def _move_chunk(path, start, stop):
+    cost = _get("cost")
+    position = moves.position_index(path, len(cost))
+    return moves.move_deltas(cost, path, position, _get("kinds")[start:stop], _get("nodes_i")[start:stop], _get("nodes_j")[start:stop])
+
+
+class NeighborhoodPool(object):
+    """Process pool evaluating chunks of the move neighborhood
+
+    The cost matrix, the move kinds (all swaps by default) and the move pairs are shared once through shared memory,
+    each task only ships the current path and the bounds of its chunk.
+    Chunks are fixed by the number of moves and gathered in order, so the
+    result does not depend on the number of workers.
+    """
+    def __init__(self, workers, cost, nodes_i, nodes_j, kinds=None, chunk_size=4096):
+        if kinds is None:
+            kinds = np.full(len(nodes_i), moves.SWAP, dtype=np.int8)
+        self.shared = SharedArrays(cost=cost, kinds=kinds, nodes_i=nodes_i, nodes_j=nodes_j)
+        self.size = len(nodes_i)
+        self.chunks = [(start, min(start + chunk_size, self.size)) for start in range(0, self.size, chunk_size)]
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(self.shared.specs,))
+
+    def deltas(self, path):
+        if not self.size:
+            return np.zeros(0)
+        path = np.asarray(path, dtype=np.int64)
+        futures = [self.executor.submit(_move_chunk, path, start, stop) for start, stop in self.chunks]
+        return np.concatenate([future.result() for future in futures])
+
+    def close(self):
+        self.executor.shutdown()
+        self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+# fields of a cache entry
+OBJECTIVE, FEASIBILITY = 0, 1
+# approximate memory of one entry: the OrderedDict slot and link, the int
+# key and the [objective, feasible] list, measured with tracemalloc
+ENTRY_BYTES = 240
+
+
+def _mix(x):
+    """splitmix64 finalizer, a bijection of uint64 spreading every input bit over the output
+    """
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def node_keys(positions, nodes):
+    """Zobrist keys of the nodes at the given positions
+
+    The key of (position, node) is a hash of the pair rather than an entry
+    of a random table, so no (N, N) table is stored for large instances.
+    """
+    positions = np.asarray(positions, dtype=np.uint64)
+    nodes = np.asarray(nodes, dtype=np.uint64)
+    return _mix((positions << np.uint64(32)) | nodes)
+
+
+def route_hash(path):
+    """Zobrist hash of a route: the xor of the keys of its (position, node) pairs
+    """
+    path = np.asarray(path)
+    return int(np.bitwise_xor.reduce(node_keys(np.arange(len(path)), path)))
+
+
+def update_hash(key, old_path, new_path, positions):
+    """Hash of new_path from the hash key of old_path, given the positions where they may differ
+
+    Only the changed positions are hashed again, so a swap costs O(1) and a
+    segment move O(length of the span it shifts).
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    if not len(positions):
+        return key
+    old_keys = node_keys(positions, np.asarray(old_path)[positions])
+    new_keys = node_keys(positions, np.asarray(new_path)[positions])
+    return key ^ int(np.bitwise_xor.reduce(old_keys)) ^ int(np.bitwise_xor.reduce(new_keys))
+
+
+class EvaluationCache(object):
+    """Bounded LRU cache of the objective value and feasibility of routes, keyed on their route_hash
+
+    Entries are evicted, least recently used first, once the cache would
+    take more than max_memory MB (estimated with ENTRY_BYTES per entry).
+    Two routes colliding on the 64 bits hash would share their entry, which
+    is negligible for the number of routes a search visits.
+    """
+    def __init__(self, max_memory=64):
+        self.max_memory = max_memory
+        self.max_entries = max(int(max_memory * 2**20) // ENTRY_BYTES, 1)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, field):
+        """Cached field of the route key, None (and a miss) if it is not known
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[field] is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[field]
+
+    def put(self, key, field, value):
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [None, None]
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.entries.move_to_end(key)
+        entry[field] = value
+
+    def clear(self):
+        self.entries.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self):
+        return {
+            "entries": len(self),
+            "memory": len(self) * ENTRY_BYTES,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,440 @@
+import numpy as np
+
+import lp
+import feasibility
+import construction
+import granular
+from search_log import SearchLog, INFO
+
+
+RELOCATE, EXCHANGE, TWO_OPT_STAR = 0, 1, 2
+MOVE_NAMES = {RELOCATE: "relocate", EXCHANGE: "exchange", TWO_OPT_STAR: "2-opt*"}
+
+
+def split_giant_tour(tour):
+    """Turns [0, 1, 2, 0, 3, 4, 0] into [[0, 1, 2, 0], [0, 3, 4, 0]]
+    """
+    routes = []
+    route = [0]
+    for node in list(tour)[1:]:
+        route.append(node)
+        if node == 0:
+            if len(route) > 2:
+                routes.append(route)
+            route = [0]
+    return routes
+
+
+class RouteSolution(object):
+    """Solution made of several routes, each one [0, ..., 0] served by its own vehicle
+
+    The cost and the load profile of every route are cached, so a move only
+    recomputes the routes it changes. Empty routes ([0, 0]) are kept so that
+    route indices stay stable and a move can open a new route.
+    """
+    def __init__(self, routes, cost, pickup, delivery, capacity):
+        self.cost = cost
+        self.pickup = pickup
+        self.delivery = delivery
+        self.capacity = capacity
+        self.routes = [list(route) for route in routes]
+        self.route_costs = [0.0] * len(self.routes)
+        self.profiles = [None] * len(self.routes)
+        # node -> route index holding it
+        self.route_of = np.full(len(cost), -1, dtype=np.int64)
+        for r in range(len(self.routes)):
+            self._refresh(r)
+
+    @classmethod
+    def from_giant_tour(cls, tour, cost, pickup, delivery, capacity, vehicles=None):
+        """Build a solution from a giant tour [0, ..., 0, ..., 0], padding with empty routes up to vehicles
+        """
+        routes = split_giant_tour(tour)
+        if vehicles is not None:
+            routes += [[0, 0]] * max(vehicles - len(routes), 0)
+        return cls(routes, cost, pickup, delivery, capacity)
+
+    def _refresh(self, r):
+        route = np.asarray(self.routes[r])
+        self.route_costs[r] = float(self.cost[route[:-1], route[1:]].sum())
+        self.profiles[r] = feasibility.LoadProfile(route, self.pickup, self.delivery, self.capacity)
+        self.route_of[route[1:-1]] = r
+
+    def copy(self):
+        solution = RouteSolution.__new__(RouteSolution)
+        solution.cost = self.cost
+        solution.pickup = self.pickup
+        solution.delivery = self.delivery
+        solution.capacity = self.capacity
+        solution.routes = [list(route) for route in self.routes]
+        solution.route_costs = list(self.route_costs)
+        # profiles are never modified in place, so they can be shared
+        solution.profiles = list(self.profiles)
+        solution.route_of = self.route_of.copy()
+        return solution
+
+    @property
+    def value(self):
+        return sum(self.route_costs)
+
+    def is_feasible(self):
+        return all(profile.is_feasible() for profile in self.profiles)
+
+    def get_routes(self):
+        """Non empty routes of the solution
+        """
+        return [list(route) for route in self.routes if len(route) > 2]
+
+    def giant_tour(self):
+        tour = [0]
+        for route in self.get_routes():
+            tour += route[1:]
+        return tour
+
+    def relocate_moves(self):
+        """Every inter-route relocation of a customer
+        Returns
+        ----------
+        (np.ndarray, np.ndarray, np.ndarray)
+        moves as rows (RELOCATE, node, target route, target position) followed
+        by their tabu attributes (node, route entered, node, route entered;
+        -1 when unused), their cost deltas and whether they keep both routes
+        within capacity
+        """
+        C = self.cost
+        rows, deltas, feasible = [], [], []
+        for a, route_a in enumerate(self.routes):
+            if len(route_a) <= 2:
+                continue
+            route_a = np.asarray(route_a)
+            p = np.arange(1, len(route_a) - 1)
+            nodes = route_a[p]
+            removal = C[route_a[p - 1], route_a[p + 1]] - C[route_a[p - 1], nodes] - C[nodes, route_a[p + 1]]
+            removal_ok = self.profiles[a].removal_max_load(p) <= self.capacity
+            for b, route_b in enumerate(self.routes):
+                if a == b:
+                    continue
+                route_b = np.asarray(route_b)
+                # broadcast nodes (column) against insertion positions t (row)
+                t = np.arange(len(route_b) - 1)[None, :]
+                u = nodes[:, None]
+                insertion = C[route_b[t], u] + C[u, route_b[t + 1]] - C[route_b[t], route_b[t + 1]]
+                insertion_ok = self.profiles[b].insertion_max_load(t, u) <= self.capacity
+                shape = insertion.shape
+                rows.append(self._rows(shape, RELOCATE, u, b, t, u, b, -1, -1))
+                deltas.append((removal[:, None] + insertion).ravel())
+                feasible.append((removal_ok[:, None] & insertion_ok).ravel())
+        return self._stack(rows, deltas, feasible)
+
+    def exchange_moves(self):
+        """Every exchange of two customers of different routes, as rows (EXCHANGE, node, node, 0, ...)
+        """
+        C = self.cost
+        rows, deltas, feasible = [], [], []
+        for a in range(len(self.routes)):
+            for b in range(a + 1, len(self.routes)):
+                route_a, route_b = np.asarray(self.routes[a]), np.asarray(self.routes[b])
+                if len(route_a) <= 2 or len(route_b) <= 2:
+                    continue
+                p = np.arange(1, len(route_a) - 1)[:, None]
+                q = np.arange(1, len(route_b) - 1)[None, :]
+                u, v = route_a[p], route_b[q]
+                delta = C[route_a[p - 1], v] + C[v, route_a[p + 1]] - C[route_a[p - 1], u] - C[u, route_a[p + 1]]
+                delta = delta + C[route_b[q - 1], u] + C[u, route_b[q + 1]] - C[route_b[q - 1], v] - C[v, route_b[q + 1]]
+                ok = (self.profiles[a].replacement_max_load(p, v) <= self.capacity) & (self.profiles[b].replacement_max_load(q, u) <= self.capacity)
+                shape = delta.shape
+                rows.append(self._rows(shape, EXCHANGE, u, v, 0, u, b, v, a))
+                deltas.append(delta.ravel())
+                feasible.append(ok.ravel())
+        return self._stack(rows, deltas, feasible)
+
+    def two_opt_star_moves(self):
+        """Every exchange of route tails, as rows (TWO_OPT_STAR, route, route, p * len + q, ...)
+
+        Route a keeps path[0..p] followed by the tail after position q of
+        route b, and route b keeps its head followed by the tail of route a.
+        """
+        C = self.cost
+        rows, deltas, feasible = [], [], []
+        for a in range(len(self.routes)):
+            for b in range(a + 1, len(self.routes)):
+                route_a, route_b = np.asarray(self.routes[a]), np.asarray(self.routes[b])
+                p = np.arange(len(route_a) - 1)[:, None]
+                q = np.arange(len(route_b) - 1)[None, :]
+                delta = C[route_a[p], route_b[q + 1]] + C[route_b[q], route_a[p + 1]] - C[route_a[p], route_a[p + 1]] - C[route_b[q], route_b[q + 1]]
+                profile_a, profile_b = self.profiles[a], self.profiles[b]
+                ok = (profile_a.tail_exchange_max_load(p, profile_b, q) <= self.capacity) & (profile_b.tail_exchange_max_load(q, profile_a, p) <= self.capacity)
+                # keeping both tails or swapping whole routes changes nothing
+                useless = ((p == 0) & (q == 0)) | ((p == len(route_a) - 2) & (q == len(route_b) - 2))
+                delta = np.where(useless, np.inf, delta)
+                shape = delta.shape
+                # the first customer of each tail carries the tabu attribute of the move
+                tail_a = np.where(p + 1 < len(route_a) - 1, route_a[p + 1], -1)
+                tail_b = np.where(q + 1 < len(route_b) - 1, route_b[q + 1], -1)
+                rows.append(self._rows(shape, TWO_OPT_STAR, a, b, p * len(route_b) + q, tail_a, b, tail_b, a))
+                deltas.append(delta.ravel())
+                feasible.append((ok & ~useless).ravel())
+        return self._stack(rows, deltas, feasible)
+
+    def positions(self):
+        """Index of every customer in its route
+        """
+        position = np.zeros(len(self.cost), dtype=np.int64)
+        for route in self.routes:
+            position[route[1:-1]] = np.arange(1, len(route) - 1)
+        return position
+
+    def candidate_moves(self, nodes_i, nodes_j):
+        """Moves bringing together the customers of candidate pairs served by different routes
+
+        For every pair (u, w), in both orientations, u is relocated right
+        before or after w and the 2-opt* move making w follow u is built, and
+        u and w are exchanged once per pair. Only O(k N) moves are built
+        (see granular.candidate_pairs), the moves between two given routes
+        being vectorized as in relocate_moves. Every relocation into the
+        first empty route is added so that a new route can still be opened.
+        """
+        C = self.cost
+        Q = self.capacity
+        position = self.positions()
+        u = np.concatenate([nodes_i, nodes_j]).astype(np.int64)
+        w = np.concatenate([nodes_j, nodes_i]).astype(np.int64)
+        first = np.arange(len(u)) < len(nodes_i)
+        keep = self.route_of[u] != self.route_of[w]
+        u, w, first = u[keep], w[keep], first[keep]
+        a, b = self.route_of[u], self.route_of[w]
+        rows, deltas, feasible = [], [], []
+        groups, inverse = np.unique(a * len(self.routes) + b, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(groups) + 1))
+        for g, group in enumerate(groups):
+            idx = order[bounds[g]:bounds[g + 1]]
+            ra, rb = divmod(int(group), len(self.routes))
+            route_a, route_b = np.asarray(self.routes[ra]), np.asarray(self.routes[rb])
+            profile_a, profile_b = self.profiles[ra], self.profiles[rb]
+            uu, ww = u[idx], w[idx]
+            p, q = position[uu], position[ww]
+
+            # relocate u after w (t = q) and before w (t = q - 1)
+            removal = C[route_a[p - 1], route_a[p + 1]] - C[route_a[p - 1], uu] - C[uu, route_a[p + 1]]
+            removal_ok = profile_a.removal_max_load(p) <= Q
+            for t in (q, q - 1):
+                insertion = C[route_b[t], uu] + C[uu, route_b[t + 1]] - C[route_b[t], route_b[t + 1]]
+                rows.append(self._rows(uu.shape, RELOCATE, uu, rb, t, uu, rb, -1, -1))
+                deltas.append(removal + insertion)
+                feasible.append(removal_ok & (profile_b.insertion_max_load(t, uu) <= Q))
+
+            # exchange u and w
+            ex = first[idx]
+            if ex.any():
+                pe, qe, ue, we = p[ex], q[ex], uu[ex], ww[ex]
+                delta = C[route_a[pe - 1], we] + C[we, route_a[pe + 1]] - C[route_a[pe - 1], ue] - C[ue, route_a[pe + 1]]
+                delta = delta + C[route_b[qe - 1], ue] + C[ue, route_b[qe + 1]] - C[route_b[qe - 1], we] - C[we, route_b[qe + 1]]
+                rows.append(self._rows(ue.shape, EXCHANGE, ue, we, 0, ue, rb, we, ra))
+                deltas.append(delta)
+                feasible.append((profile_a.replacement_max_load(pe, we) <= Q) & (profile_b.replacement_max_load(qe, ue) <= Q))
+
+            # 2-opt*: route a keeps its head up to u followed by the tail of route b from w
+            qt = q - 1
+            delta = C[route_a[p], route_b[qt + 1]] + C[route_b[qt], route_a[p + 1]] - C[route_a[p], route_a[p + 1]] - C[route_b[qt], route_b[qt + 1]]
+            ok = (profile_a.tail_exchange_max_load(p, profile_b, qt) <= Q) & (profile_b.tail_exchange_max_load(qt, profile_a, p) <= Q)
+            tail_a = np.where(p + 1 < len(route_a) - 1, route_a[np.minimum(p + 1, len(route_a) - 1)], -1)
+            rows.append(self._rows(uu.shape, TWO_OPT_STAR, ra, rb, p * len(route_b) + qt, tail_a, rb, ww, ra))
+            deltas.append(delta)
+            feasible.append(ok)
+
+        empty = [r for r, route in enumerate(self.routes) if len(route) <= 2]
+        if empty:
+            e = empty[0]
+            customers = np.flatnonzero(self.route_of >= 0)
+            ra = self.route_of[customers]
+            p = position[customers]
+            for r in np.unique(ra):
+                route_a = np.asarray(self.routes[r])
+                pr, ur = p[ra == r], customers[ra == r]
+                removal = C[route_a[pr - 1], route_a[pr + 1]] - C[route_a[pr - 1], ur] - C[ur, route_a[pr + 1]]
+                insertion = C[0, ur] + C[ur, 0] - C[0, 0]
+                rows.append(self._rows(ur.shape, RELOCATE, ur, e, 0, ur, e, -1, -1))
+                deltas.append(removal + insertion)
+                feasible.append((self.profiles[r].removal_max_load(pr) <= Q) & (self.profiles[e].insertion_max_load(0, ur) <= Q))
+        return self._stack(rows, deltas, feasible)
+
+    def _rows(self, shape, *columns):
+        return np.stack([np.broadcast_to(column, shape) for column in columns], axis=-1).reshape(-1, len(columns))
+
+    def _stack(self, rows, deltas, feasible):
+        if not rows:
+            return np.zeros((0, 8), dtype=np.int64), np.zeros(0), np.zeros(0, dtype=bool)
+        return np.concatenate(rows).astype(np.int64), np.concatenate(deltas).astype(float), np.concatenate(feasible)
+
+    def neighborhood(self):
+        """Relocate, exchange and 2-opt* moves of the solution, see relocate_moves
+        """
+        parts = [self.relocate_moves(), self.exchange_moves(), self.two_opt_star_moves()]
+        return tuple(np.concatenate(part) for part in zip(*parts))
+
+    def apply(self, move):
+        """Apply a move in place, refreshing only the routes it changes
+        """
+        kind, x, y, z = (int(value) for value in move[:4])
+        if kind == RELOCATE:
+            a = int(self.route_of[x])
+            self.routes[a].remove(x)
+            self.routes[y].insert(z + 1, x)
+            changed = [a, y]
+        elif kind == EXCHANGE:
+            a, b = int(self.route_of[x]), int(self.route_of[y])
+            p, q = self.routes[a].index(x), self.routes[b].index(y)
+            self.routes[a][p], self.routes[b][q] = y, x
+            changed = [a, b]
+        else:
+            route_a, route_b = self.routes[x], self.routes[y]
+            p, q = divmod(z, len(route_b))
+            self.routes[x] = route_a[:p + 1] + route_b[q + 1:]
+            self.routes[y] = route_b[:q + 1] + route_a[p + 1:]
+            changed = [x, y]
+        for r in changed:
+            self._refresh(r)
+        return self
+
+
+class Route_Tabu_Search(lp.LP):
+    """Tabu search over several vehicles with inter-route relocate, exchange and 2-opt* moves
+
+    A move is tabu when it puts a node back into a route it left less than
+    tabu_tenure iterations ago, unless it improves the best value
+    (aspiration). Moves are penalized by how often their nodes entered
+    those routes, as in Tabu_Search.
+    """
+    def __init__(self, lp, vehicles=None, N_iter=10, tabu_tenure=5, penalty_value=5, initial_solution=None, verbosity="iteration", sample_every=1, trace=None, candidate_k=None, fallback=True):
+        super().__init__(**lp.get_problem())
+        self.vehicles = vehicles
+        self.tabu_tenure = tabu_tenure
+        self.N_iter = N_iter
+        self.penalty_value = penalty_value
+        self.initial_solution = initial_solution
+        self.best_solution = None
+        self.iterations = 0
+        self.log = SearchLog(verbosity=verbosity, sample_every=sample_every, trace=trace)
+        # granular search over the candidate_k nearest neighbor lists, then
+        # over the full neighborhood once it stagnates if fallback is set
+        self.candidate_k = candidate_k
+        self.fallback = fallback
+
+    def make_solution(self, routes):
+        return RouteSolution(routes, self.cost, self.pickup, self.delivery, self.capacity)
+
+    def get_initial_solution(self):
+        """Initial routes, from initial_solution (list of routes or giant tour) or
+        from the savings construction
+        """
+        if self.initial_solution is not None:
+            routes = self.initial_solution
+            if not isinstance(routes[0], (list, tuple)):
+                routes = split_giant_tour(routes)
+        else:
+            routes = construction.savings_routes(self.cost, self.pickup, self.delivery, self.capacity)
+        vehicles = self.vehicles if self.vehicles is not None else len(routes) + 1
+        if len(routes) > vehicles:
+            self.log.print(f"Initial solution uses {len(routes)} routes, more than the {vehicles} vehicles available.")
+        routes = [list(route) for route in routes] + [[0, 0]] * max(vehicles - len(routes), 0)
+        return self.make_solution(routes)
+
+    def run(self):
+        log = self.log
+        log.print("="*100)
+        log.print("MULTI-VEHICLE TABU SEARCH START\n")
+
+        current = self.get_initial_solution()
+        best = current.copy()
+        best_value = best.value
+        vehicles_num = len(current.routes)
+        tabu_time = np.zeros([len(self.cost), vehicles_num], dtype=np.int64)
+        freq = np.zeros([len(self.cost), vehicles_num], dtype=np.int64)
+        i = 1
+        i_termination = 0
+
+        log.print("Initial routes:", current.get_routes())
+        log.print("Initial value:", best_value)
+        log.print("Feasible:", current.is_feasible())
+        log.print()
+
+        pairs = None
+        if self.candidate_k is not None and self.candidate_k < len(self.cost) - 2:
+            pairs = granular.candidate_pairs(self.get_candidates(self.candidate_k))
+
+        while True:
+            if i_termination >= self.N_iter:
+                if pairs is None or not self.fallback:
+                    break
+                # the granular neighborhood stagnates, go on with the full one
+                pairs = None
+                i_termination = 0
+                log.record("fallback", level=INFO, iteration=i)
+            if pairs is not None:
+                moves, deltas, feasible = current.candidate_moves(*pairs)
+            else:
+                moves, deltas, feasible = current.neighborhood()
+            if not len(moves):
+                if pairs is not None:
+                    # no candidate move, stop or fall back as on stagnation
+                    i_termination = self.N_iter
+                    continue
+                log.record("iteration", level=INFO, status="No inter-route move available")
+                break
+            values = current.value + deltas
+            # tabu status and frequency of the (node, route entered) attributes of each move
+            is_tabu = np.zeros(len(moves), dtype=bool)
+            frequency = np.zeros(len(moves))
+            for node_col, route_col in ((4, 5), (6, 7)):
+                used = moves[:, node_col] >= 0
+                nodes, routes = moves[used, node_col], moves[used, route_col]
+                is_tabu[used] |= tabu_time[nodes, routes] >= i
+                frequency[used] += freq[nodes, routes]
+            penalty = values + self.penalty_value * frequency
+            admissible = feasible & (~is_tabu | (values < best_value))
+            penalty = np.where(admissible, penalty, np.inf)
+            move_idx = int(np.argmin(penalty))
+            if penalty[move_idx] == np.inf:
+                if log.sampled(i):
+                    log.record("iteration", iteration=i, status="All available moves are Tabu, Inadmissible or Infeasible")
+                i_termination += 1
+                i += 1
+                continue
+
+            move = moves[move_idx]
+            for node, route in ((move[4], move[5]), (move[6], move[7])):
+                if node < 0:
+                    continue
+                # forbid the node to go back to the route it leaves
+                tabu_time[node, current.route_of[node]] = i + self.tabu_tenure
+                freq[node, route] += 1
+            current.apply(move)
+
+            if current.value < best_value:
+                best = current.copy()
+                best_value = best.value
+                i_termination = 0
+                status = "Best Improving => Admissible"
+            else:
+                i_termination += 1
+                status = "Least non-Improving => Admissible"
+            if log.sampled(i):
+                log.record("iteration", iteration=i, move=(MOVE_NAMES[int(move[0])],) + tuple(int(value) for value in move[1:4]), move_value=current.value, status=status)
+            i += 1
+
+        self.best_solution = best
+        self.iterations = i
+        log.print("\nMULTI-VEHICLE TABU SEARCH FINISHED")
+        log.record("finish", level=INFO, best_routes=best.get_routes(), best_value=best_value, iteration=i)
+        log.print("="*100)
+        log.close()
+
+    def get_best_solution(self):
+        return self.best_solution.get_routes()
+
+    def get_best_value(self):
+        return self.best_solution.value
+
+    def __str__(self):
+        return "\nMulti-Vehicle Tabu Search Registered."
@@ -0,0 +1,93 @@
+import sys
+import json
+import pprint
+import numpy as np
+
+
+QUIET, INFO, ITERATION, DEBUG = 0, 1, 2, 3
+LEVELS = {"quiet": QUIET, "info": INFO, "iteration": ITERATION, "debug": DEBUG}
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class TraceWriter(object):
+    """Buffered JSON lines writer
+
+    Records are kept in memory and appended to the file buffer_size at a
+    time, so tracing a run costs one write per buffer_size records.
+    """
+    def __init__(self, path, buffer_size=1000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(record, default=_to_builtin) + "\n" for record in self.buffer))
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+
+class SearchLog(object):
+    """Verbosity-controlled output of a search and its optional JSON lines trace
+
+    Levels, each one including the previous ones:
+    - quiet: nothing is printed
+    - info: start, restarts and final result
+    - iteration: one record per move decision, every sample_every iterations
+    - debug: also the full tabu structure before every move decision
+    The trace receives the event records (start, sampled iterations,
+    restarts, finish) whatever the verbosity. Printing goes to the current
+    sys.stdout unless a stream is given.
+    """
+    def __init__(self, verbosity="info", sample_every=1, trace=None, stream=None):
+        if verbosity not in LEVELS:
+            raise ValueError(f"Unknown verbosity: {verbosity}. Use one of {', '.join(LEVELS)}.")
+        self.level = LEVELS[verbosity]
+        self.sample_every = max(int(sample_every), 1)
+        self.trace = TraceWriter(trace) if isinstance(trace, str) else trace
+        self.stream = stream
+
+    def enabled(self, level):
+        return self.level >= level
+
+    def sampled(self, iteration):
+        """Whether the record of this iteration is printed or traced
+        """
+        return (self.level >= ITERATION or self.trace is not None) and iteration % self.sample_every == 0
+
+    def print(self, *args, level=INFO):
+        if self.level >= level:
+            print(*args, file=self.stream or sys.stdout)
+
+    def pprint(self, value, level=DEBUG):
+        if self.level >= level:
+            pprint.pprint(value, stream=self.stream or sys.stdout)
+
+    def record(self, event, level=ITERATION, **fields):
+        """Print the fields as "key : value" lines at level (never when None) and append them to the trace
+        """
+        if self.trace is not None:
+            self.trace.write({"event": event, **fields})
+        if level is not None and self.level >= level:
+            for key, value in fields.items():
+                self.print(f"{key: <20}:", value, level=level)
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import argparse
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import lp
+import data
+import batch_solver
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+# (payload key, problem) parsed by this worker process by instance key, least recently used first
+_problems = OrderedDict()
+
+
+def payload_key(request):
+    """Key of the instance sent with a request as "problem" or "instance", None when there is none
+    """
+    if "problem" in request:
+        return "problem:" + hashlib.sha1(json.dumps(request["problem"], sort_keys=True).encode()).hexdigest()
+    if "instance" in request:
+        return "instance:" + json.dumps([request["instance"], request.get("seed"), request.get("options", {})], sort_keys=True)
+    return None
+
+
+def instance_key(request):
+    """Key of the instance of a request, the same for every request on the same instance
+
+    A request gives its instance either by "instance" (path, bundled name or
+    "create_instance" with "seed" and "options", as in batch_solver
+    manifests) or by an inline "problem". An "instance_id" names the
+    instance so that later requests may send the id alone, a request
+    sending the id with another instance names the new one by it.
+    """
+    if "instance_id" in request:
+        return f"id:{request['instance_id']}"
+    key = payload_key(request)
+    if key is None:
+        raise ValueError('The request gives neither "instance", "problem" nor "instance_id".')
+    return key
+
+
+def build_problem(payload):
+    """lp.LP of an inline problem {"cost" or "coordinates", "pickup", "delivery", "capacity"}, node 0 being the depot
+
+    Coordinates give Euclidean distances computed on demand (see
+    data.benchmark.EuclideanCost), rounded to "precision" decimals if given.
+    """
+    if "cost" in payload:
+        cost = np.asarray(payload["cost"], dtype=float)
+    else:
+        cost = data.benchmark.EuclideanCost(payload["coordinates"], precision=payload.get("precision"))
+    return lp.LP(
+        graph=None,
+        cost=cost,
+        objective_function=None,
+        constraints=None,
+        pickup=np.asarray(payload["pickup"], dtype=float),
+        delivery=np.asarray(payload["delivery"], dtype=float),
+        capacity=float(payload["capacity"]),
+    )
+
+
+def get_problem(request, key, cache_size):
+    """Problem of a request from the cache of this worker, parsed on a miss
+
+    The lp.LP is kept whole, so its nearest neighbor lists (LP.candidates)
+    and compiled constraints are only computed by the first request. An
+    instance_id sent with an instance other than the cached one is parsed
+    again and replaces it.
+    Returns
+    ----------
+    (lp.LP, bool)
+    the problem and whether it came from the cache
+    """
+    payload = payload_key(request)
+    cached = _problems.get(key)
+    if cached is not None and payload in (None, cached[0]):
+        _problems.move_to_end(key)
+        return cached[1], True
+    if "problem" in request:
+        problem = build_problem(request["problem"])
+    elif "instance" in request:
+        problem = batch_solver.load_problem(request)
+    else:
+        raise KeyError(f"Unknown instance_id {request['instance_id']}, send it with its problem or instance first.")
+    _problems[key] = (payload, problem)
+    _problems.move_to_end(key)
+    while len(_problems) > cache_size:
+        _problems.popitem(last=False)
+    return problem, False
+
+
+def handle_request(request, key, cache_size=32, defaults=None):
+    """Solve one request in a worker process and return its response, errors included
+    """
+    start_time = time.perf_counter()
+    response = {"id": request.get("id")}
+    try:
+        problem, cached = get_problem(request, key, cache_size)
+        options = {**(defaults or {}), **{name: request[name] for name in batch_solver.SOLVER_OPTIONS if name in request}}
+        response.update(batch_solver.solve_problem(problem, options))
+        response["cached"] = cached
+    except Exception as error:
+        response.update({"status": "error", "error": repr(error), "traceback": traceback.format_exc()})
+    response["runtime"] = time.perf_counter() - start_time
+    return response
+
+
+class SolveServer(object):
+    """Long-running solver answering JSON requests over stdio or local HTTP
+
+    The asyncio front end reads requests and answers each one as soon as it
+    is solved, with at most max_pending requests in flight. Requests are
+    solved by worker processes that stay up, each keeping the last
+    cache_size problems it parsed. Every instance key is always sent to the
+    same worker, so requests on an instance seen before skip its parsing,
+    its neighbor lists and its compiled constraints.
+    """
+    def __init__(self, workers=None, max_pending=None, cache_size=32, **defaults):
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending or 4 * self.workers
+        self.cache_size = cache_size
+        self.defaults = defaults
+        self.backends = [ProcessPoolExecutor(max_workers=1) for _ in range(self.workers)]
+        # start the worker processes now rather than on the first request
+        for backend in self.backends:
+            backend.submit(os.getpid).result()
+        self.semaphore = None
+        self.counters = {"requests": 0, "errors": 0, "pending": 0}
+
+    def close(self):
+        for backend in self.backends:
+            backend.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def solve(self, request):
+        """Response to one request, solved by the worker its instance key is bound to
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_pending)
+        self.counters["requests"] += 1
+        if not isinstance(request, dict):
+            self.counters["errors"] += 1
+            return {"id": None, "status": "error", "error": "A request is a JSON object."}
+        try:
+            key = instance_key(request)
+        except ValueError as error:
+            self.counters["errors"] += 1
+            return {"id": request.get("id"), "status": "error", "error": repr(error)}
+        k = zlib.crc32(key.encode()) % len(self.backends)
+        backend = self.backends[k]
+        async with self.semaphore:
+            self.counters["pending"] += 1
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(backend, handle_request, request, key, self.cache_size, self.defaults)
+            except BrokenProcessPool as error:
+                # the worker died (killed, out of memory, ...): answer and
+                # replace it, unless a concurrent request already did
+                if self.backends[k] is backend:
+                    backend.shutdown(wait=False)
+                    self.backends[k] = ProcessPoolExecutor(max_workers=1)
+                response = {"id": request.get("id"), "status": "error", "error": f"Worker died while solving the request: {error!r}"}
+            except Exception as error:
+                response = {"id": request.get("id"), "status": "error", "error": repr(error)}
+            finally:
+                self.counters["pending"] -= 1
+        if response["status"] != "ok":
+            self.counters["errors"] += 1
+        return response
+
+    def status(self):
+        return {"status": "ok", "workers": self.workers, "max_pending": self.max_pending, **self.counters}
+
+    async def _answer_line(self, line, stream):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as error:
+            response = {"id": None, "status": "error", "error": repr(error)}
+        else:
+            response = await self.solve(request)
+        stream.write(json.dumps(response) + "\n")
+        stream.flush()
+
+    async def serve_stdio(self, stdin=None, stdout=None):
+        """Answer the JSON requests read line by line from stdin with JSON lines on stdout, until stdin closes
+
+        Responses are written in completion order and carry the "id" of
+        their request.
+        """
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        while True:
+            line = await loop.run_in_executor(None, stdin.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.create_task(self._answer_line(line, stdout))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    async def _answer_http(self, reader, writer):
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            if method == "POST" and path == "/solve":
+                code, response = 200, await self.solve(json.loads(body))
+            elif method == "GET" and path == "/status":
+                code, response = 200, self.status()
+            else:
+                code, response = 404, {"status": "error", "error": f"No route for {method} {path}, use POST /solve or GET /status."}
+        except (ValueError, asyncio.IncompleteReadError) as error:
+            code, response = 400, {"status": "error", "error": repr(error)}
+        except Exception as error:
+            code, response = 500, {"status": "error", "error": repr(error)}
+        payload = json.dumps(response).encode()
+        head = f"HTTP/1.1 {code} {REASONS[code]}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n"
+        writer.write(head.encode() + payload)
+        await writer.drain()
+        writer.close()
+
+    async def serve_http(self, host="127.0.0.1", port=8765):
+        """Answer POST /solve with a JSON request body, and GET /status, until cancelled
+        """
+        server = await asyncio.start_server(self._answer_http, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--http', action='store_true', help='Serve HTTP on --host and --port instead of JSON lines on stdio.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address the HTTP server listens on.')
+    parser.add_argument('--port', type=int, default=8765, help='Port the HTTP server listens on.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes, defaults to the number of CPUs.')
+    parser.add_argument('--max_pending', type=int, default=None, help='Requests solved or queued at once, defaults to 4 per worker.')
+    parser.add_argument('--cache_size', type=int, default=32, help='Problems kept by every worker between requests.')
+    parser.add_argument('--time_limit', type=float, default=None, help='Default wall-clock budget in seconds of every request.')
+    parser.add_argument('--N_iter', type=int, default=10, help='Default non-improving iterations before a search terminates.')
+    args = parser.parse_args()
+
+    with SolveServer(workers=args.workers, max_pending=args.max_pending, cache_size=args.cache_size, time_limit=args.time_limit, N_iter=args.N_iter) as server:
+        if args.http:
+            try:
+                asyncio.run(server.serve_http(args.host, args.port))
+            except KeyboardInterrupt:
+                pass
+        else:
+            asyncio.run(server.serve_stdio())
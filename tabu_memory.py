@@ -0,0 +1,166 @@
+import numpy as np
+
+import moves
+
+
+class TabuMemory(object):
+    """Tabu attributes of every move stored as flat arrays
+
+    Swap moves are the node pairs (i, j), i < j, of the upper triangle over
+    the customer nodes, in the same order as ``combinations(V_C, 2)``. Each
+    attribute (tabu_time, freq, move_value, penalty) is one array with one
+    entry per move, so 1,000 customers take about 10 MB instead of half a
+    million dicts. With pairs = (nodes_i, nodes_j), sorted by (i, j) with
+    i < j as given by granular.candidate_pairs, only those moves are kept.
+
+    With several operators (see moves.OPERATORS) the moves of every kind
+    follow each other as one block, kinds[idx] telling the kind of a move,
+    so each operator keeps its own tabu attributes. 2-opt moves also
+    reverse from the start of the route, as pairs (0, j). Relocate and
+    or-opt moves are ordered, both (i, j) and (j, i) are kept, plus (i, 0)
+    to move a segment to the start of the route.
+    """
+    def __init__(self, nodes, pairs=None, operators=("swap",)):
+        nodes = np.asarray(list(nodes), dtype=np.int32)
+        self.nodes = nodes
+        self.granular = pairs is not None
+        if pairs is None:
+            upper_i, upper_j = np.triu_indices(len(nodes), 1)
+            pair_i, pair_j = nodes[upper_i], nodes[upper_j]
+        else:
+            pair_i = np.asarray(pairs[0], dtype=np.int32)
+            pair_j = np.asarray(pairs[1], dtype=np.int32)
+        depot = np.zeros(len(nodes), dtype=np.int32)
+
+        self.operators = tuple(operators)
+        blocks = []
+        for kind in moves.get_kinds(self.operators):
+            if kind == moves.SWAP:
+                block_i, block_j = pair_i, pair_j
+            elif kind == moves.TWO_OPT:
+                block_i, block_j = np.concatenate((depot, pair_i)), np.concatenate((nodes, pair_j))
+            else:
+                block_i = np.concatenate((pair_i, pair_j, nodes))
+                block_j = np.concatenate((pair_j, pair_i, depot))
+            blocks.append((kind, block_i, block_j))
+        self.kinds = np.concatenate([np.full(len(block_i), kind, dtype=np.int8) for kind, block_i, _ in blocks])
+        self.nodes_i = np.concatenate([block_i for _, block_i, _ in blocks])
+        self.nodes_j = np.concatenate([block_j for _, _, block_j in blocks])
+        # kind -> (start, stop) of its block in the attribute arrays
+        self.blocks = {}
+        start = 0
+        for kind, block_i, _ in blocks:
+            self.blocks[kind] = (start, start + len(block_i))
+            start += len(block_i)
+        # kind -> sorted pair keys and their indices, built on the first lookup
+        self.lookup = {}
+
+        size = len(self.nodes_i)
+        self.tabu_time = np.zeros(size, dtype=np.int32)
+        self.freq = np.zeros(size, dtype=np.int32)
+        self.move_value = np.zeros(size, dtype=float)
+        self.penalty = np.zeros(size, dtype=float)
+        # moves excluded as tabu by the last best_admissible
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self.nodes_i)
+
+    def __contains__(self, move):
+        return self.index(*move) is not None
+
+    def index(self, node_i, node_j, kind=moves.SWAP):
+        """Position of the move (node_i, node_j) of the given kind in the attribute arrays
+        """
+        idx = self.indices(kind, [node_i], [node_j])
+        return int(idx[0]) if len(idx) and idx[0] >= 0 else None
+
+    def indices(self, kind, nodes_i, nodes_j):
+        """Vectorized index over arrays of node pairs, -1 for the moves not in the memory
+        """
+        nodes_i = np.asarray(nodes_i, dtype=np.int64)
+        nodes_j = np.asarray(nodes_j, dtype=np.int64)
+        if kind not in self.blocks:
+            return np.full(len(nodes_i), -1, dtype=np.int64)
+        if kind in (moves.SWAP, moves.TWO_OPT):
+            nodes_i, nodes_j = np.minimum(nodes_i, nodes_j), np.maximum(nodes_i, nodes_j)
+        width = int(self.nodes.max()) + 1 if len(self.nodes) else 1
+        if kind not in self.lookup:
+            start, stop = self.blocks[kind]
+            keys = self.nodes_i[start:stop].astype(np.int64) * width + self.nodes_j[start:stop]
+            order = np.argsort(keys, kind="stable")
+            self.lookup[kind] = (keys[order], order + start)
+        keys, indices = self.lookup[kind]
+        if not len(keys):
+            return np.full(len(nodes_i), -1, dtype=np.int64)
+        inside = (nodes_i >= 0) & (nodes_i < width) & (nodes_j >= 0) & (nodes_j < width)
+        query = np.where(inside, nodes_i * width + nodes_j, -1)
+        found = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+        return np.where(inside & (keys[found] == query), indices[found], -1)
+
+    def transfer(self, other, mapping, iterations=0):
+        """Take over the frequencies and tabu times of the moves of another memory
+
+        mapping[node] is the number in this memory of a node of the other one
+        (-1 when it is gone), as given by instance_delta.apply_delta. Moves
+        of the other memory that are not in this one are dropped. Tabu times
+        are shifted back by iterations, the iterations the other memory was
+        used for, since every search counts its iterations from 1.
+        """
+        mapping = np.asarray(mapping, dtype=np.int64)
+        for kind, (start, stop) in other.blocks.items():
+            nodes_i = mapping[other.nodes_i[start:stop]]
+            nodes_j = mapping[other.nodes_j[start:stop]]
+            idx = self.indices(kind, nodes_i, nodes_j)
+            kept = (nodes_i >= 0) & (nodes_j >= 0) & (idx >= 0)
+            self.freq[idx[kept]] = other.freq[start:stop][kept]
+            self.tabu_time[idx[kept]] = np.maximum(other.tabu_time[start:stop][kept] - iterations, 0)
+
+    def move(self, idx):
+        return (int(self.nodes_i[idx]), int(self.nodes_j[idx]))
+
+    def kind(self, idx):
+        return int(self.kinds[idx])
+
+    def update_values(self, move_values, penalty_value):
+        """Store the objective value of every move and penalize it by its frequency
+        """
+        self.move_value[:] = move_values
+        self.penalty[:] = self.move_value + self.freq * penalty_value
+
+    def best_admissible(self, iteration, best_value):
+        """Index of the least penalized admissible move, or None if there is none
+
+        A move is admissible when it is not tabu at this iteration, or when it
+        is tabu but would improve on best_value (aspiration). Moves whose
+        penalty was set to inf are never admissible.
+        """
+        if not len(self):
+            return None
+        admissible = (self.tabu_time < iteration) | (self.move_value < best_value)
+        self.rejected = len(self) - int(np.count_nonzero(admissible))
+        penalty = np.where(admissible, self.penalty, np.inf)
+        idx = int(np.argmin(penalty))
+        if penalty[idx] == np.inf:
+            return None
+        return idx
+
+    def make_tabu(self, idx, iteration, tenure):
+        self.tabu_time[idx] = iteration + tenure
+        self.freq[idx] += 1
+
+    def as_dict(self):
+        """The memory as the {(i, j): {"tabu_time", "move_value", "freq", "penalty"}} mapping, for printing
+
+        Keys are (operator, i, j) when the memory holds other moves than swaps.
+        """
+        swaps_only = self.operators == ("swap",)
+        return {
+            (self.move(idx) if swaps_only else (moves.MOVE_NAMES[self.kind(idx)],) + self.move(idx)): {
+                "tabu_time": int(self.tabu_time[idx]),
+                "move_value": float(self.move_value[idx]),
+                "freq": int(self.freq[idx]),
+                "penalty": float(self.penalty[idx]),
+            }
+            for idx in range(len(self))
+        }
@@ -0,0 +1,102 @@
+import time
+
+
+PHASES = ("neighborhood", "selection", "feasibility", "move")
+COUNTERS = (
+    "moves_evaluated",
+    "move_decisions",
+    "improvements",
+    "aspiration_hits",
+    "tabu_rejections",
+    "infeasible_moves",
+    "infeasible_rejections",
+    "restarts",
+)
+
+
+class SearchStats(object):
+    """Phase timers, counters and best-value curve of a search, with its hooks
+
+    Phases:
+    - neighborhood: evaluating the move neighborhood and its penalties
+    - selection: finding the least penalized admissible move
+    - feasibility: checking the load of the selected move
+    - move: applying the move and updating the route, value and load profile
+    Counters:
+    - moves_evaluated: moves whose value was computed
+    - move_decisions: selected moves, applied or rejected
+    - improvements: new best solutions, the initial one included
+    - aspiration_hits: tabu moves taken because they improve the best value
+    - tabu_rejections: moves excluded from a selection because they are tabu
+    - infeasible_moves: improving moves applied although they break the capacity
+    - infeasible_rejections: aspiration moves rejected because they break the capacity
+    - restarts: restarts from restart_solution
+    best_curve holds one (seconds, iteration, value) entry per improvement.
+    Every hook is called as hook(event, stats) on the "iteration" (after
+    every move decision), "improvement", "restart" and "finish" events, and
+    the stats are read from the object itself (stats.iteration,
+    stats.best_value, ...). Timers and counters are a few additions per
+    iteration, so they stay on in every run.
+    """
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks) if hooks is not None else []
+        self.reset()
+
+    def reset(self):
+        self.start_time = time.perf_counter()
+        self.runtime = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.best_curve = []
+        self.iteration = 0
+        self.best_value = None
+        self.status = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def emit(self, event):
+        for hook in self.hooks:
+            hook(event, self)
+
+    def add_time(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def improvement(self, iteration, value):
+        self.iteration = iteration
+        self.best_value = value
+        self.counters["improvements"] += 1
+        self.best_curve.append((self.elapsed(), iteration, value))
+        self.emit("improvement")
+
+    def finish(self, iteration):
+        self.iteration = iteration
+        self.runtime = self.elapsed()
+        self.emit("finish")
+
+    @property
+    def moves_per_second(self):
+        seconds = self.phases["neighborhood"]
+        return self.counters["moves_evaluated"] / seconds if seconds > 0 else 0.0
+
+    @property
+    def iterations_per_second(self):
+        return self.iteration / self.runtime if self.runtime > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "runtime": self.runtime,
+            "iterations": self.iteration,
+            "iterations_per_second": self.iterations_per_second,
+            "moves_per_second": self.moves_per_second,
+            "phases": dict(self.phases),
+            "counters": dict(self.counters),
+            "best_value": self.best_value,
+            "best_curve": [list(point) for point in self.best_curve],
+        }
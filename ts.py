@@ -1,44 +1,88 @@
 import lp
+import moves
+import batch
+import feasibility
+import parallel
+import construction
+import instance_delta
+import exact
+import granular as granular_search
+import route_cache
+from tabu_memory import TabuMemory
+from routes import Route_Tabu_Search
+from search_log import SearchLog, INFO, ITERATION, DEBUG
+from telemetry import SearchStats
 import numpy as np
-from itertools import permutations, combinations
 
 import os
 import sys
 from datetime import datetime
-import pprint
+import time
 import argparse
 
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--log', type=str, help='Specify log filepath for output. Input "cmd" to to display on the command line. Otherwise new file will be automatically created.')
-args = parser.parse_args()
-log_to_cmd = False
-if args.log is not None:
-    if args.log.lower() == 'cmd':
-        log_to_cmd = True
+# moves of the first chunk of a neighborhood evaluated against the clock, see Tabu_Search.evaluate_neighborhood_within
+NEIGHBORHOOD_CHUNK = 65536
 
 
 class Tabu_Search(lp.LP):
-    def __init__(self, lp, N_iter=10, tabu_tenure=5, penalty_value=5, initial_solution=None):
-        super().__init__(**lp.__dict__)
+    def __init__(self, lp, N_iter=10, tabu_tenure=5, penalty_value=5, initial_solution=None, evaluation="compiled", workers=None, time_limit=None, on_improvement=None, restart_solution=None, construction="savings", verbosity="iteration", sample_every=1, trace=None, hooks=None, max_evaluations=None, target_value=None, candidate_k=None, fallback=True, operators=("swap", "2-opt", "relocate", "or-opt"), cache_memory=64):
+        super().__init__(**lp.get_problem())
+        if evaluation not in ("compiled", "reference"):
+            raise ValueError(f"Unknown evaluation mode: {evaluation}. Use 'compiled' or 'reference'.")
+        self.construction = construction
+        self.evaluation = evaluation
         self.tabu_tenure = tabu_tenure
         self.N_iter = N_iter
         self.penalty_value = penalty_value
         self.initial_solution = initial_solution
+        self.workers = workers
+        # besides N_iter non-improving iterations, the search stops after
+        # time_limit seconds, max_evaluations evaluated moves or once the
+        # best value reaches target_value, see get_termination
+        self.time_limit = time_limit
+        self.max_evaluations = max_evaluations
+        self.target_value = target_value
+        self.termination = None
+        # granular search: moves are restricted to the pairs of the
+        # candidate_k nearest neighbor lists, then to every pair once that
+        # neighborhood stagnates if fallback is set
+        self.candidate_k = candidate_k
+        self.fallback = fallback
+        # intra-route operators of the neighborhood, see moves.OPERATORS
+        moves.get_kinds(operators)
+        self.operators = tuple(operators)
+        # objective values and feasibility of the routes met, keyed on their
+        # Zobrist hash in an LRU cache of cache_memory MB (None or 0 disables
+        # it), see route_cache.EvaluationCache
+        self.cache = route_cache.EvaluationCache(cache_memory) if cache_memory else None
+        # on_improvement(path, value) is called on every new best solution,
+        # restart_solution() may return a path to restart from after N_iter
+        # non-improving iterations instead of terminating
+        self.on_improvement = on_improvement
+        self.restart_solution = restart_solution
+        # verbosity, sampling and JSON lines trace of the output, see search_log.SearchLog
+        self.log = SearchLog(verbosity=verbosity, sample_every=sample_every, trace=trace)
+        # phase timers, counters and best-value curve of the last run, hooks
+        # are called as hook(event, stats), see telemetry.SearchStats
+        self.stats = SearchStats(hooks)
+        self.restarts = 0
+        self.neighborhood_pool = None
+        # tabu memory left by the last search, and the (path, tabu memory)
+        # the next search starts from instead of building them, see reoptimize
+        self.tabu_structure = None
+        self.warm_start = None
         self.best_solution = None
+        self.best_value = None
+        self.iterations = 0
         
-    def get_tabu_structure(self):
-        tabu_structure = {}
-        V_C = [node for node in self.graph.nodes if node != 0]
-        for swap in combinations(V_C, 2):
-            tabu_structure[swap] = {
-                "tabu_time": 0,
-                "move_value": 0,
-                "freq": 0,
-                "penalty": 0
-            }
-            
-        return tabu_structure
+    def get_tabu_structure(self, granular=True):
+        """Tabu memory of the operators over the candidate pairs of the granular search, or over every pair of customers
+        """
+        V_C = range(1, len(self.cost))
+        if not granular or self.candidate_k is None or self.candidate_k >= len(self.cost) - 2:
+            return TabuMemory(V_C, operators=self.operators)
+        return TabuMemory(V_C, pairs=granular_search.candidate_pairs(self.get_candidates(self.candidate_k)), operators=self.operators)
         
     def construct_edge_order(self, node_order):
         """Turns something like [0, 1, 2, 3, 4, 0] to [(0, 1), (1, 2), (2, 3), (3, 4), (4, 0)]
@@ -52,35 +96,56 @@ class Tabu_Search(lp.LP):
     def construct_edge_matrix(self, path_as_edge_order):
         """Turns [(0, 1), (1, 2), (2, 3), (3, 4), (4, 0)] into adjacency matrix
         """
-        vertices_num = len(self.graph.nodes)
+        vertices_num = len(self.cost)
         edges_matrix = np.zeros([vertices_num, vertices_num])
         for edge in path_as_edge_order:
             edges_matrix[edge] = 1
         return edges_matrix
         
-    def get_initial_solution(self, perm_search=4):
+    def get_initial_solution(self):
         if self.initial_solution is not None:
             if self.check_constraints(self.initial_solution):
                 return self.initial_solution
             else:
-                print("Given initial solution {0} violates constraints.".format(self.initial_solution))
-                print("New initial solution will be searched.")
+                self.log.print("Given initial solution {0} violates constraints.".format(self.initial_solution))
+                self.log.print("New initial solution will be searched.")
 
-        V_C = [node for node in self.graph.nodes if node != 0]
-        all_possible_paths = [[0] + list(p) + [0] for p in permutations(V_C, min(len(V_C), perm_search))]
-        
-        for candidate_init_path in all_possible_paths:
-            if not self.check_constraints(candidate_init_path):
-                return candidate_init_path
-            
-        if perm_search < len(V_C):
-            # keep searching by increasing the search space by adding the permutation number
-            return self.get_initial_solution(self, perm_search=perm_search+1)
-        else:
-            return f"No possible solution found after P_r={perm_search}."
+        # try the chosen construction first, then the others
+        methods = [self.construction] + [method for method in construction.CONSTRUCTIONS if method != self.construction]
+        for method in methods:
+            path = construction.construct_route(method, self.cost, self.pickup, self.delivery, self.capacity)
+            if self.check_constraints(path):
+                return path
+            self.log.print("Initial solution built by {0} construction violates constraints.".format(method))
+        return construction.construct_route(self.construction, self.cost, self.pickup, self.delivery, self.capacity)
     
-    def evaluate_objective_function(self, path):
+    def evaluate_objective_function(self, path, key=None):
         """Evaluate the objective function from a given path
+        
+        The compiled mode sums C[path[k]][path[k+1]] over the route with
+        fancy indexing. The reference mode evaluates the OBJ_FUNC string.
+        Values are cached on key, the route_cache.route_hash of the path,
+        computed when not given.
+        """
+        if self.cache is None:
+            return self.compute_objective_function(path)
+        key = route_cache.route_hash(path) if key is None else key
+        value = self.cache.get(key, route_cache.OBJECTIVE)
+        if value is None:
+            value = self.compute_objective_function(path)
+            self.cache.put(key, route_cache.OBJECTIVE, value)
+        return value
+    
+    def compute_objective_function(self, path):
+        """Evaluate the objective function of a path without the cache
+        """
+        if self.evaluation == "reference":
+            return self.evaluate_objective_function_reference(path)
+        path = np.asarray(path)
+        return float(self.cost[path[:-1], path[1:]].sum())
+    
+    def evaluate_objective_function_reference(self, path):
+        """Evaluate the objective function string on the edge matrix of a given path
         """
         path_as_edge_order = self.construct_edge_order(path)
         X = self.construct_edge_matrix(path_as_edge_order)
@@ -90,121 +155,399 @@ class Tabu_Search(lp.LP):
     def construct_YZ_flow(self, path_as_edge_order):
         """Construct the flow of pickup and delivery between each nodes
         """
-        vertices_num = len(self.graph.nodes)
+        vertices_num = len(self.cost)
+        edges = np.array(path_as_edge_order, dtype=np.int64).reshape(-1, 2)
+        i, j = edges[:, 0], edges[:, 1]
         
         Y = np.zeros([vertices_num, vertices_num])
-        pickup = 0
-        for edge in path_as_edge_order:
-            i = edge[0]
-            j = edge[1]
-            pickup += self.pickup[i]
-            Y[i][j] = pickup
-        assert pickup == sum(self.pickup) 
+        pickup = np.cumsum(self.pickup[i])
+        Y[i, j] = pickup
+        assert pickup[-1] == sum(self.pickup) 
         
         Z = np.zeros([vertices_num, vertices_num])
-        delivery = sum(self.delivery)
-        for edge in path_as_edge_order:
-            i = edge[0]
-            j = edge[1]
-            delivery -= self.delivery[i]
-            Z[i][j] = delivery
-        assert delivery == 0
+        delivery = sum(self.delivery) - np.cumsum(self.delivery[i])
+        Z[i, j] = delivery
+        assert delivery[-1] == 0
         
         return Y, Z
     
-    def check_constraints(self, path):
+    def get_load_profile(self, path):
+        """Load profile of a path, used to check moves against the capacity without rebuilding Y and Z
+        """
+        return feasibility.LoadProfile(path, self.pickup, self.delivery, self.capacity)
+    
+    def get_route_key(self, path):
+        """Cache key of a path, None when there is no cache
+        """
+        return route_cache.route_hash(path) if self.cache is not None else None
+    
+    def get_move_key(self, key, path, position, new_path, kind, node_i, node_j):
+        """Cache key of new_path, the path with the move (node_i, node_j) applied, updated from the key of path
+        """
+        if key is None:
+            return None
+        return route_cache.update_hash(key, path, new_path, moves.changed_positions(path, position, kind, node_i, node_j))
+    
+    def evaluate_routes(self, routes):
+        """Cost and feasibility of an (M, N + 1) array of candidate routes in one pass, see batch.evaluate_routes
+        """
+        return batch.evaluate_routes(self.cost, routes, self.pickup, self.delivery, self.capacity)
+    
+    def check_move_feasibility(self, path, position, profile, kind, node_i, node_j, key=None):
+        """Check whether the move (node_i, node_j) of the given kind keeps a feasible path feasible
+        In compiled mode only the vehicle load can change, which the load
+        profile of the path answers in O(1) for every kind of move. In
+        reference mode the moved path is checked against the constraints,
+        cached on its key updated from key, the cache key of path.
+        """
+        if self.evaluation == "reference":
+            new_path = moves.apply_move(path, position, kind, node_i, node_j)[0]
+            return self.check_constraints(new_path, key=self.get_move_key(key, path, position, new_path, kind, node_i, node_j))
+        a, b = position[node_i], position[node_j]
+        if kind == moves.SWAP:
+            return bool(profile.swap_feasible(a, b))
+        if kind == moves.TWO_OPT:
+            a, b = min(a, b), max(a, b)
+            return bool(profile.reversal_feasible(a + 1, b))
+        end = min(a + moves.SEGMENT_LENGTH[kind], len(path) - 1) - 1
+        return bool(profile.segment_move_feasible(a, end, b))
+    
+    def check_constraints(self, path, return_violations=False, key=None):
         """Check the potential solution path against the constraints
         Parameters
         ----------
         path : List
         list of edges that corresponds a path
+        return_violations : bool
+        also return the list of violated constraints
+        key : int
+        route_cache.route_hash of the path, computed when not given. The
+        result is cached unless return_violations is set
         Returns
         ----------
         bool
         indicates whether the constraints are violated or not
+        (bool, list)
+        if return_violations is set, the list holds one dict per violation
+        with the constraint index, family, string, lhs and rhs
         """
+        if self.cache is None or return_violations:
+            return self.compute_constraints(path, return_violations)
+        key = route_cache.route_hash(path) if key is None else key
+        feasible = self.cache.get(key, route_cache.FEASIBILITY)
+        if feasible is None:
+            feasible = bool(self.compute_constraints(path))
+            self.cache.put(key, route_cache.FEASIBILITY, feasible)
+        return feasible
+    
+    def compute_constraints(self, path, return_violations=False):
+        """Check a path against the constraints without the cache, see check_constraints
+        """
+        if self.evaluation != "reference" and self.compiled_constraints is None:
+            # no constraint strings, check the route structure and its load
+            feasible, violations = feasibility.check_route(path, len(self.cost), self.pickup, self.delivery, self.capacity)
+            return (feasible, violations) if return_violations else feasible
         path_as_edge_order = self.construct_edge_order(path)
         X = self.construct_edge_matrix(path_as_edge_order)
+        Y, Z = self.construct_YZ_flow(path_as_edge_order)
+        if self.evaluation == "reference":
+            feasible, violations = self.check_constraints_reference(X, Y, Z)
+        else:
+            feasible, violations = self.compiled_constraints.check(X, Y, Z, C=self.cost, P=self.pickup, D=self.delivery, Q=self.capacity, first_only=not return_violations)
+        if return_violations:
+            return feasible, violations
+        return feasible
+    
+    def check_constraints_reference(self, X, Y, Z):
+        """Evaluate the constraint strings one by one, stopping at the first violation
+        """
         C = self.cost
         P = self.pickup
         D = self.delivery
         Q = self.capacity
-        Y, Z = self.construct_YZ_flow(path_as_edge_order)
-        # print("Matriks flow Y:")
-        # print(Y)
-        # print("Matriks flow Z:")
-        # print(Z)
-        # print("Matriks flow Y + Z:")
-        # print(Y + Z)
-
-        for constraint in self.constraints:
-            # print(constraint)
+        for idx, constraint in enumerate(self.constraints):
             if eval(constraint) == False:
-                print("The path {0} violates the following constraint:\n{1}\n".format(path, constraint))
-                return False
-        return True
+                return False, [{"index": idx, "family": "expression", "constraint": constraint, "lhs": None, "rhs": None}]
+        return True, []
     
-    def swap_move(self, path, node_i, node_j):
+    def swap_move(self, path, node_i, node_j, position=None):
         '''Takes a list (solution)
         returns a new neighbor solution with i, j swapped
+        position is an optional node->index map of path to skip the path.index() lookups
        '''
         path = path.copy()
         # job index in the solution:
-        i_index = path.index(node_i)
-        j_index = path.index(node_j)
+        if position is not None:
+            i_index = position[node_i]
+            j_index = position[node_j]
+        else:
+            i_index = path.index(node_i)
+            j_index = path.index(node_j)
         #Swap
         path[i_index], path[j_index] = path[j_index], path[i_index]
         return path
     
+    def evaluate_neighborhood(self, path, value, kinds, nodes_i, nodes_j):
+        '''Objective value of every move of path given as arrays of kinds and node pairs
+        In compiled mode only the (at most four) edges touched by each move are
+        evaluated, 2-opt reversals through prefix sums, so the whole
+        neighborhood costs O(N^2). Moves that change nothing are inf. In
+        reference mode every moved path is evaluated through the cache, so
+        the neighbors of a path already scored are not evaluated again.
+        '''
+        if self.neighborhood_pool is not None:
+            return value + self.neighborhood_pool.deltas(path)
+        position = moves.position_index(path, len(self.cost))
+        values = value + moves.move_deltas(self.cost, path, position, kinds, nodes_i, nodes_j)
+        if self.evaluation == "reference":
+            key = self.get_route_key(path)
+            for idx in np.flatnonzero(np.isfinite(values)):
+                kind, node_i, node_j = kinds[idx], nodes_i[idx], nodes_j[idx]
+                new_path = moves.apply_move(path, position, kind, node_i, node_j)[0]
+                values[idx] = self.evaluate_objective_function(new_path, key=self.get_move_key(key, path, position, new_path, kind, node_i, node_j))
+        return values
+    
     def run_brute(self):
-        print("="*100)
-        print("BRUTE FORCE SEARCH START\n")
-        V_C = [node for node in self.graph.nodes if node != 0]
-        all_possible_paths = [[0] + list(p) + [0] for p in permutations(V_C, len(V_C))]
-        
-        init_path = self.get_initial_solution()
-        
-        current_best_path = init_path
-        current_best_val = self.evaluate_objective_function(current_best_path)
-        
-        print("Initial solution:", current_best_path)
-        print("Initial value:", current_best_val)
-        print()
+        """Exact search for the optimal route with Held-Karp dynamic programming, see exact.held_karp
+        """
+        self.log.print("="*100)
+        self.log.print("EXACT SEARCH START\n")
+        start_time = time.perf_counter()
+        path, value = exact.held_karp(self.cost, self.pickup, self.delivery, self.capacity)
         
-        #Brute force all possible paths
-        for path in all_possible_paths:
-            print("Checking path:", path)
-            val = self.evaluate_objective_function(path)
-            print("Value:", val)
-            if not self.check_constraints(path):
-                print("Constraints violated!")
-                print()
-                continue
-            print("Constraints not violated, solution is feasible!")
-            print(f"Compare: {val} < {current_best_val}")
-            if val < current_best_val:
-                print("Current value is better, this solution is currently the best!")
-                current_best_path = path
-                current_best_val = self.evaluate_objective_function(current_best_path)
-            else:
-                print(f"Currently checked value is not better than before. The path {path} is not chosen")
-            print()
+        if path is None:
+            self.log.print("No route keeps the load within capacity.")
+        else:
+            self.best_solution = path
+            self.best_value = value
+            self.log.print(f"{'best_path': <20}:", path)
+            self.log.print(f"{'best_value': <20}:", value)
+            self.log.print(f"{'feasible': <20}:", self.check_constraints(path))
+        self.log.print(f"{'runtime': <20}: {time.perf_counter() - start_time:.3f} s")
+        self.log.print("\nEXACT SEARCH FINISHED")
+        self.log.print("="*100)
+    
+    def record_improvement(self, path, value, iteration=0, on_improvement=None):
+        """Keep the best solution over every restart and report it to on_improvement
 
-        self.best_solution = current_best_path
-        print("BRUTE FORCE SEARCH FINISHED")
-        print("="*100)
+        on_improvement defaults to the one given to the constructor.
+        Returns whether the solution is a new best one.
+        """
+        on_improvement = on_improvement if on_improvement is not None else self.on_improvement
+        if self.best_value is None or value < self.best_value:
+            self.best_solution = path
+            self.best_value = value
+            self.stats.improvement(iteration, value)
+            if on_improvement is not None:
+                on_improvement(path, value)
+            return True
+        return False
+    
+    def get_neighborhood_pool(self, tabu_structure):
+        """Process pool evaluating the neighborhood when workers > 1 (compiled evaluation only)
+        """
+        if self.workers is None or self.workers <= 1 or self.evaluation != "compiled":
+            return None
+        return parallel.NeighborhoodPool(self.workers, self.cost, tabu_structure.nodes_i, tabu_structure.nodes_j, kinds=tabu_structure.kinds)
+    
+    def get_budgets(self, time_limit=None, max_evaluations=None, target_value=None, on_improvement=None):
+        """Budgets of one search, those not given being the ones of the constructor
+        """
+        budgets = {"time_limit": time_limit, "max_evaluations": max_evaluations, "target_value": target_value, "on_improvement": on_improvement}
+        return {name: value if value is not None else getattr(self, name) for name, value in budgets.items()}
+    
+    def evaluate_neighborhood_within(self, path, value, tabu_structure, deadline):
+        """Same as evaluate_neighborhood over the moves of tabu_structure, in growing chunks watching the clock
+        Parameters
+        ----------
+        deadline : float
+        time.perf_counter() time the whole neighborhood has to be evaluated by
+        Returns
+        ----------
+        (np.ndarray, int)
+        the value of every move, None when the moves left were expected to
+        end after deadline, and the number of moves evaluated
+        """
+        size = len(tabu_structure)
+        values = np.empty(size)
+        start, chunk = 0, NEIGHBORHOOD_CHUNK
+        phase_start = time.perf_counter()
+        while start < size:
+            stop = min(start + chunk, size)
+            values[start:stop] = self.evaluate_neighborhood(path, value, tabu_structure.kinds[start:stop], tabu_structure.nodes_i[start:stop], tabu_structure.nodes_j[start:stop])
+            start, chunk = stop, 2 * chunk
+            now = time.perf_counter()
+            if start < size and now + (now - phase_start) * (size - start) / start >= deadline:
+                return None, start
+        return values, size
+    
+    def get_termination(self, start_time, neighborhood_size, budgets=None):
+        """Reason to stop before evaluating the next neighborhood, None to go on
+
+        The neighborhoods do not exceed the budgets: the search stops when the
+        next neighborhood would not fit in the evaluation budget, or when the
+        next iteration, expected to take as long per move as the moves
+        evaluated so far, would overrun the time limit. The first
+        neighborhood, whose time is not known yet, is evaluated in chunks
+        that stop short of the time limit (see evaluate_neighborhood_within),
+        unless a neighborhood pool evaluates it whole. The initial
+        construction is not interrupted, it may take longer than the time
+        limit by itself.
+        """
+        budgets = budgets if budgets is not None else self.get_budgets()
+        evaluated = self.stats.counters["moves_evaluated"]
+        if budgets["target_value"] is not None and self.best_value is not None and self.best_value <= budgets["target_value"]:
+            return "target_value"
+        if budgets["time_limit"] is not None:
+            expected = sum(self.stats.phases.values()) * neighborhood_size / evaluated if evaluated else 0.0
+            if time.perf_counter() - start_time + expected >= budgets["time_limit"]:
+                return "time_limit"
+        if budgets["max_evaluations"] is not None and evaluated + neighborhood_size > budgets["max_evaluations"]:
+            return "max_evaluations"
+        return None
+    
+    def search(self, time_limit=None, max_evaluations=None, target_value=None, on_improvement=None):
+        """Run the search as a generator yielding (path, value) on every new best solution
+
+        The best solution so far is also kept in best_solution and best_value,
+        so stopping the generator early leaves a usable result. Budgets given
+        here only apply to this search, see get_budgets.
+        """
+        try:
+            yield from self._run(self.get_budgets(time_limit, max_evaluations, target_value, on_improvement))
+        finally:
+            if self.termination is None:
+                # the caller stopped the generator before the end of the search
+                self.termination = "stopped"
+                self.iterations = self.stats.iteration
+                self.stats.finish(self.stats.iteration)
+            self.log.close()
+            if self.neighborhood_pool is not None:
+                self.neighborhood_pool.close()
+                self.neighborhood_pool = None
     
     def run(self):
-        print("="*100)
-        print("TABU SEARCH START\n")
+        for _ in self.search():
+            pass
+    
+    def solve(self, time_limit=None, max_evaluations=None, target_value=None, on_improvement=None):
+        """Run the search within the given budgets and return its result
+        Parameters
+        ----------
+        time_limit : float
+        wall-clock budget in seconds, the initial construction included
+        max_evaluations : int
+        maximum number of evaluated moves
+        target_value : float
+        stop as soon as the best value is at most this value
+        on_improvement : callable
+        called as on_improvement(path, value) on every new best solution
+        Returns
+        ----------
+        dict
+        best path and value, feasibility, termination reason
+        ("stagnation", "time_limit", "max_evaluations", "target_value" or
+        "stopped" when solve_iter is closed early),
+        iterations, runtime, the telemetry.SearchStats of the run and the
+        hit-rate stats of the evaluation cache
+        """
+        for _ in self.solve_iter(time_limit=time_limit, max_evaluations=max_evaluations, target_value=target_value, on_improvement=on_improvement):
+            pass
+        return self.get_result()
+    
+    def solve_iter(self, time_limit=None, max_evaluations=None, target_value=None, on_improvement=None):
+        """Same as solve, as a generator yielding {"path", "value", "iteration", "elapsed"} on every new best solution
+        """
+        for path, value in self.search(time_limit=time_limit, max_evaluations=max_evaluations, target_value=target_value, on_improvement=on_improvement):
+            yield {"path": list(path), "value": value, "iteration": self.stats.iteration, "elapsed": self.stats.elapsed()}
+    
+    def reoptimize(self, delta, time_limit=None, max_evaluations=None, target_value=None, on_improvement=None):
+        """Solve the instance again after a small change, from the last best route and tabu memory
+        Parameters
+        ----------
+        delta : dict
+        added, cancelled and updated customers and new capacity, see instance_delta.apply_delta
+        time_limit, max_evaluations, target_value, on_improvement
+        budgets of the search, see solve
+        Returns
+        ----------
+        dict
+        same as solve, node numbers being those of the changed instance
+
+        The previous best route loses the cancelled customers, the added ones
+        are inserted at their cheapest load-feasible position and the updated
+        ones are taken out and inserted again if the route no longer fits the
+        capacity. The frequencies and tabu times of the moves that still
+        exist carry over to the new tabu memory, and the nearest neighbor
+        lists are kept when the costs did not change.
+        """
+        if self.best_solution is None or self.tabu_structure is None:
+            raise ValueError("Nothing to re-optimize, solve the problem first.")
+        cost, pickup, delivery, capacity, mapping, added = instance_delta.apply_delta(self.cost, self.pickup, self.delivery, self.capacity, delta)
+        self.set_instance(cost, pickup, delivery, capacity)
+        if self.cache is not None:
+            self.cache.clear()
+        # the previous initial solution does not fit the changed instance
+        self.initial_solution = None
+
+        route = [int(mapping[node]) for node in self.best_solution if mapping[node] >= 0]
+        updated = [int(mapping[int(node)]) for node in delta.get("update", {}) if mapping[int(node)] >= 0]
+        if updated and not self.get_load_profile(route).is_feasible():
+            route = construction.repair_route(route, updated, cost, pickup, delivery, capacity)
+        route = construction.repair_route(route, added, cost, pickup, delivery, capacity)
+
+        tabu_structure = self.get_tabu_structure()
+        tabu_structure.transfer(self.tabu_structure, mapping, iterations=self.iterations)
+        self.warm_start = (route, tabu_structure)
+        return self.solve(time_limit=time_limit, max_evaluations=max_evaluations, target_value=target_value, on_improvement=on_improvement)
+    
+    def get_result(self):
+        return {
+            "path": self.best_solution,
+            "value": self.best_value,
+            "feasible": None if self.best_solution is None else bool(self.check_constraints(self.best_solution)),
+            "termination": self.termination,
+            "iterations": self.iterations,
+            "runtime": self.stats.runtime,
+            "stats": self.stats,
+            "cache": self.cache.as_dict() if self.cache is not None else None,
+        }
+    
+    def _run(self, budgets):
+        log = self.log
+        stats = self.stats
+        stats.reset()
+        log.print("="*100)
+        log.print("TABU SEARCH START\n")
+        start_time = time.perf_counter()
         
-        init_path = self.get_initial_solution() # returns: [0, 1, 3, 2, 0]
+        tabu_structure = None
+        if self.warm_start is not None:
+            init_path, tabu_structure = self.warm_start
+            self.warm_start = None
+            if not self.check_constraints(init_path):
+                log.print("Repaired solution {0} violates constraints.".format(init_path))
+                log.print("New initial solution will be searched.")
+                init_path = self.get_initial_solution()
+        else:
+            init_path = self.get_initial_solution() # returns: [0, 1, 3, 2, 0]
         
         current_path = init_path
-        current_value = self.evaluate_objective_function(current_path)
+        current_key = self.get_route_key(current_path)
+        current_value = self.evaluate_objective_function(current_path, key=current_key)
         best_path = init_path
-        best_value = self.evaluate_objective_function(best_path)
-        tabu_structure = self.get_tabu_structure()
+        best_value = current_value
+        self.best_solution = None
+        self.best_value = None
+        self.restarts = 0
+        self.termination = None
+        if self.record_improvement(best_path, best_value, on_improvement=budgets["on_improvement"]):
+            yield best_path, best_value
+        if tabu_structure is None:
+            tabu_structure = self.get_tabu_structure()
+        self.neighborhood_pool = self.get_neighborhood_pool(tabu_structure)
+        current_position = moves.position_index(current_path, len(self.cost))
+        current_profile = self.get_load_profile(current_path)
         tenure = self.tabu_tenure
         # iteration to keep track of tabu tenure. instead of reducing the value
         # of tabu tenure of every swap in every iteration, just increase the
@@ -214,106 +557,198 @@ class Tabu_Search(lp.LP):
         # iteration for termination if no better solution is found
         i_termination = 0
         
-        print("Initial solution:", best_path)
-        print("Initial value:", best_value)
-        print()
+        log.print("Initial solution:", best_path)
+        log.print("Initial value:", best_value)
+        log.print()
+        log.record("start", level=None, path=best_path, value=best_value)
         
-        while i_termination < self.N_iter:
+        while True:
+            if i_termination >= self.N_iter and self.fallback and tabu_structure.granular:
+                # the granular neighborhood stagnates, go on with every pair,
+                # keeping the frequencies and tabu times of the granular moves
+                full_structure = self.get_tabu_structure(granular=False)
+                full_structure.transfer(tabu_structure, np.arange(len(self.cost)))
+                tabu_structure = full_structure
+                if self.neighborhood_pool is not None:
+                    self.neighborhood_pool.close()
+                    self.neighborhood_pool = self.get_neighborhood_pool(tabu_structure)
+                i_termination = 0
+                log.record("fallback", level=INFO, iteration=i, neighborhood=len(tabu_structure))
+            if i_termination >= self.N_iter:
+                restart_path = self.restart_solution() if self.restart_solution is not None else None
+                if restart_path is None:
+                    self.termination = "stagnation"
+                    break
+                # restart around the given solution, the frequencies kept in
+                # tabu_structure keep penalizing the moves already explored
+                current_path = best_path = list(restart_path)
+                current_key = self.get_route_key(current_path)
+                current_value = best_value = self.evaluate_objective_function(current_path, key=current_key)
+                current_position = moves.position_index(current_path, len(self.cost))
+                current_profile = self.get_load_profile(current_path)
+                if self.record_improvement(best_path, best_value, i, on_improvement=budgets["on_improvement"]):
+                    yield best_path, best_value
+                self.restarts += 1
+                i_termination = 0
+                stats.count("restarts")
+                stats.emit("restart")
+                log.record("restart", level=INFO, iteration=i, path=best_path, value=best_value)
+            self.termination = self.get_termination(start_time, len(tabu_structure), budgets)
+            if self.termination is not None:
+                log.print(f"\nSearch stopped: {self.termination} has been reached\n")
+                break
             
-            # process through all possible swaps as neighborhood of current solution
-            for move in tabu_structure.keys():
-                candidate_path = self.swap_move(best_path, move[0], move[1])
-                candidate_path_value = self.evaluate_objective_function(candidate_path)
-                tabu_structure[move]["move_value"] = candidate_path_value
-                tabu_structure[move]["penalty"] = candidate_path_value + (tabu_structure[move]["freq"] * self.penalty_value)
+            # process through all possible moves as neighborhood of current solution
+            phase_start = time.perf_counter()
+            if budgets["time_limit"] is not None and not stats.counters["moves_evaluated"] and self.neighborhood_pool is None:
+                # the time of a neighborhood is not known before the first one
+                move_values, evaluated = self.evaluate_neighborhood_within(best_path, best_value, tabu_structure, start_time + budgets["time_limit"])
+            else:
+                move_values = self.evaluate_neighborhood(best_path, best_value, tabu_structure.kinds, tabu_structure.nodes_i, tabu_structure.nodes_j)
+                evaluated = len(move_values)
+            stats.add_time("neighborhood", time.perf_counter() - phase_start)
+            stats.count("moves_evaluated", evaluated)
+            if move_values is None:
+                self.termination = "time_limit"
+                log.print(f"\nSearch stopped: {self.termination} has been reached\n")
+                break
+            tabu_structure.update_values(move_values, self.penalty_value)
                     
             # find admissible move by intensification phase
                 
             # find admissible move by diversification phase
+            # the tabu moves are the same on every pass, count them once
+            rejections_counted = False
             while True:
-                print()
-                print(f"{'Current_best_path': <20}:", best_path)
-                print(f"{'Current_best_value': <20}:", best_value)
-                print("Tabu Structure:")
-                pprint.pprint(tabu_structure)
-                # select the move with the lowest penalized value
-                best_move = min(tabu_structure, key=lambda x: tabu_structure[x]["penalty"])
+                if log.enabled(DEBUG):
+                    log.print(level=DEBUG)
+                    log.print(f"{'Current_best_path': <20}:", best_path, level=DEBUG)
+                    log.print(f"{'Current_best_value': <20}:", best_value, level=DEBUG)
+                    log.print("Tabu Structure:", level=DEBUG)
+                    log.pprint(tabu_structure.as_dict())
+                # select the admissible move with the lowest penalized value,
+                # tabu moves are only admissible if they improve the best value
+                phase_start = time.perf_counter()
+                move_idx = tabu_structure.best_admissible(i, best_value)
+                stats.add_time("selection", time.perf_counter() - phase_start)
+                if not rejections_counted:
+                    stats.count("tabu_rejections", tabu_structure.rejected)
+                    rejections_counted = True
+                stats.iteration = i
                 
-                if tabu_structure[best_move]["penalty"] == np.inf:
-                    print(f"{'status': <20}: All available moves are Tabu and Inadmissible")
+                if move_idx is None:
+                    if log.sampled(i):
+                        log.record("iteration", iteration=i, status="All available moves are Tabu and Inadmissible")
                     i_termination += 1
                     break
                     
-                move_value = tabu_structure[best_move]["move_value"]
-                tabu_time = tabu_structure[best_move]["tabu_time"]
-                print(f"{'best_move': <20}:", best_move)
-                print(f"{'move_value': <20}:", move_value)
-                print(f"{'best_move_penalty': <20}:", tabu_structure[best_move]["penalty"])
-                print(f"{'i_termination': <20}:", i_termination)
-                print(f"{'iteration': <20}:", i)
+                best_move = tabu_structure.move(move_idx)
+                move_kind = tabu_structure.kind(move_idx)
+                move_value = tabu_structure.move_value[move_idx]
+                tabu_time = tabu_structure.tabu_time[move_idx]
+                # record of the move decision, completed with its status below
+                record = None
+                if log.sampled(i):
+                    record = {
+                        "operator": moves.MOVE_NAMES[move_kind],
+                        "best_move": best_move,
+                        "move_value": move_value,
+                        "best_move_penalty": tabu_structure.penalty[move_idx],
+                        "i_termination": i_termination,
+                        "iteration": i,
+                    }
                 # if the least penalized move not tabu
+                stats.count("move_decisions")
                 if tabu_time < i:
+                    phase_start = time.perf_counter()
+                    feasible = self.check_move_feasibility(current_path, current_position, current_profile, move_kind, best_move[0], best_move[1], key=current_key)
+                    stats.add_time("feasibility", time.perf_counter() - phase_start)
                     # make the move
-                    current_path = self.swap_move(current_path, best_move[0], best_move[1])
-                    current_value = self.evaluate_objective_function(current_path)
+                    phase_start = time.perf_counter()
+                    new_path, new_position = moves.apply_move(current_path, current_position, move_kind, best_move[0], best_move[1])
+                    current_key = self.get_move_key(current_key, current_path, current_position, new_path, move_kind, best_move[0], best_move[1])
+                    current_path, current_position = new_path, new_position
+                    current_value = self.evaluate_objective_function(current_path, key=current_key)
+                    current_profile = self.get_load_profile(current_path)
+                    stats.add_time("move", time.perf_counter() - phase_start)
                     # least penalized move is a better move
                     if move_value < best_value:
                         # least penalized move don't violate constraints
-                        if self.check_constraints(current_path):
+                        if feasible:
                             best_path = current_path
                             best_value = current_value
-                            print(f"{'status': <20}: Best Improving => Admissible")
+                            if self.record_improvement(best_path, best_value, i, on_improvement=budgets["on_improvement"]):
+                                yield best_path, best_value
+                            status = "Best Improving => Admissible"
                             i_termination = 0
                         # least penalized move violates constraints
                         else:
-                            print(f"{'status': <20}: Best Improving => Infeasible")
+                            status = "Best Improving => Infeasible"
+                            stats.count("infeasible_moves")
                             i_termination += 1
                     # least penalized move is not a better move
                     else:
-                        print(f"{'status': <20}: Least non-Improving => Admissible")
+                        status = "Least non-Improving => Admissible"
                         i_termination += 1
-                    # update tabu_time and frequency of swap
-                    tabu_structure[best_move]["tabu_time"] = i + tenure
-                    tabu_structure[best_move]["freq"] += 1
+                    if record is not None:
+                        log.record("iteration", **record, status=status)
+                    stats.status = status
+                    stats.emit("iteration")
+                    # update tabu_time and frequency of the move
+                    tabu_structure.make_tabu(move_idx, i, tenure)
                     i += 1
                     break
-                # if the move is tabu
+                # if the move is tabu, it can only be admissible by aspiration
                 else:
                     # Aspiration criteria
                     # tabu move have better value
                     if move_value < best_value:
                         # tabu move don't violate constraints
-                        if self.check_constraints(current_path):
-                            current_path = self.swap_move(current_path, best_move[0], best_move[1])
-                            current_value = self.evaluate_objective_function(current_path)
+                        phase_start = time.perf_counter()
+                        feasible = self.check_move_feasibility(current_path, current_position, current_profile, move_kind, best_move[0], best_move[1], key=current_key)
+                        stats.add_time("feasibility", time.perf_counter() - phase_start)
+                        if feasible:
+                            phase_start = time.perf_counter()
+                            new_path, new_position = moves.apply_move(current_path, current_position, move_kind, best_move[0], best_move[1])
+                            current_key = self.get_move_key(current_key, current_path, current_position, new_path, move_kind, best_move[0], best_move[1])
+                            current_path, current_position = new_path, new_position
+                            current_value = self.evaluate_objective_function(current_path, key=current_key)
+                            current_profile = self.get_load_profile(current_path)
+                            stats.add_time("move", time.perf_counter() - phase_start)
                             best_path = current_path
                             best_value = current_value
-                            tabu_structure[best_move]['freq'] += 1
+                            if self.record_improvement(best_path, best_value, i, on_improvement=budgets["on_improvement"]):
+                                yield best_path, best_value
+                            tabu_structure.freq[move_idx] += 1
                             i_termination = 0 
                             i += 1
-                            print(f"{'status': <20}: Aspiration => Admissible")
+                            if record is not None:
+                                log.record("iteration", **record, status="Aspiration => Admissible")
+                            stats.count("aspiration_hits")
+                            stats.status = "Aspiration => Admissible"
+                            stats.emit("iteration")
                             break
                         # tabu move violates constraints
                         else:
-                            tabu_structure[best_move]['penalty'] = np.inf
-                            print(f"{'status': <20}: Aspiration => Infeasible")
+                            tabu_structure.penalty[move_idx] = np.inf
+                            if record is not None:
+                                log.record("iteration", **record, status="Aspiration => Infeasible")
+                            stats.count("infeasible_rejections")
+                            stats.status = "Aspiration => Infeasible"
+                            stats.emit("iteration")
                             # continue searching better move
                             continue
-                    # tabu move is not even better
-                    else:
-                        tabu_structure[best_move]['penalty'] = np.inf
-                        print(f"{'status': <20}: Tabu => Inadmissible")
-                        # continue searching better move
-                        continue
-            print("\nIteration {0} have been reached without finding the next best solution\n".format(self.N_iter))
+            log.print("\nIteration {0} have been reached without finding the next best solution\n".format(self.N_iter), level=ITERATION)
         
-        self.best_solution = best_path
-        print("\nTABU SEARCH FINISHED")
-        print(f"{'best_path': <20}:", best_path)
-        print(f"{'best_value': <20}:", best_value)
-        print(f"{'i_termination': <20}:", i_termination)
-        print(f"{'iteration': <20}:", i)
-        print("="*100)
+        best_path = self.best_solution
+        best_value = self.best_value
+        self.iterations = i
+        self.tabu_structure = tabu_structure
+        stats.finish(i)
+        log.print("\nTABU SEARCH FINISHED")
+        log.record("finish", level=INFO, best_path=best_path, best_value=best_value, i_termination=i_termination, iteration=i)
+        log.record("stats", level=ITERATION, runtime=stats.runtime, moves_per_second=stats.moves_per_second, phases=stats.phases, counters=stats.counters, cache=self.cache.as_dict() if self.cache is not None else None)
+        log.print("="*100)
     
     def get_best_solution(self):
         return self.best_solution
@@ -327,6 +762,21 @@ class Tabu_Search(lp.LP):
 
 if __name__ == "__main__":
     
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--log', type=str, help='Specify log filepath for output. Input "cmd" to to display on the command line. Otherwise new file will be automatically created.')
+    parser.add_argument('--vehicles', type=int, default=None, help='Also solve the problem with up to this many vehicles using inter-route moves.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes evaluating the neighborhood of each iteration.')
+    parser.add_argument('--verbosity', type=str, default='iteration', choices=['quiet', 'info', 'iteration', 'debug'], help='Output level. "debug" also prints the tabu structure before every move.')
+    parser.add_argument('--sample_every', type=int, default=1, help='Print and trace the record of one iteration out of this many.')
+    parser.add_argument('--trace', type=str, default=None, help='JSON lines file the iteration records are appended to.')
+    parser.add_argument('--operators', type=str, nargs='+', default=['swap', '2-opt', 'relocate', 'or-opt'], choices=['swap', '2-opt', 'relocate', 'or-opt'], help='Intra-route operators of the neighborhood.')
+    parser.add_argument('--evaluation', type=str, default='compiled', choices=['compiled', 'reference'], help='Objective evaluation mode. "reference" evaluates the OBJ_FUNC string of the instance for cross-checking.')
+    args = parser.parse_args()
+    log_to_cmd = False
+    if args.log is not None:
+        if args.log.lower() == 'cmd':
+            log_to_cmd = True
+    
     log_folder = os.path.join(os.getcwd(), "log")
     LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}_Log-TS.log"
     os.makedirs(log_folder, exist_ok=True)
@@ -345,19 +795,28 @@ if __name__ == "__main__":
     penalty_value = 10000
     # initial_solution = None
     
-    ts_brute = Tabu_Search(lp, initial_solution=initial_solution, penalty_value=penalty_value)
+    ts_brute = Tabu_Search(lp, initial_solution=initial_solution, penalty_value=penalty_value, evaluation=args.evaluation, verbosity=args.verbosity)
     ts_brute.run_brute()
     
-    ts = Tabu_Search(lp, N_iter=10, initial_solution=initial_solution, penalty_value=penalty_value)
+    ts = Tabu_Search(lp, N_iter=10, initial_solution=initial_solution, penalty_value=penalty_value, evaluation=args.evaluation, workers=args.workers, operators=args.operators, verbosity=args.verbosity, sample_every=args.sample_every, trace=args.trace)
     ts.run()
     
-    print("Best solution (brute force)")
+    print("Best solution (exact)")
     print("Path:", ts_brute.get_best_solution())
     print("Value:", ts_brute.get_best_value())
     print()
     print("Best solution (tabu search)")
     print("Path:", ts.get_best_solution())
     print("Value:", ts.get_best_value())
+    print("Optimality gap: {0:.2%}".format(exact.optimality_gap(ts.get_best_value(), ts_brute.get_best_value())))
+    
+    if args.vehicles is not None:
+        ts_routes = Route_Tabu_Search(lp, vehicles=args.vehicles, N_iter=10, penalty_value=penalty_value, verbosity=args.verbosity)
+        ts_routes.run()
+        print()
+        print(f"Best solution (tabu search, {args.vehicles} vehicles)")
+        print("Routes:", ts_routes.get_best_solution())
+        print("Value:", ts_routes.get_best_value())
     
     if LOG_FILE_PATH is not None:
         sys.stdout = original_stdout
\ No newline at end of file
@@ -4,7 +4,7 @@ from itertools import permutations, combinations
 
 class Tabu_Search(lp.LP):
     def __init__(self, lp, N_iter=10, tabu_tenure=3):
-        super().__init__(**lp.__dict__)
+        super().__init__(**lp.get_problem())
         self.tabu_tenure = tabu_tenure
         self.N_iter = N_iter
         self.best_solution = None